@@ -0,0 +1,284 @@
+import asyncio
+import inspect
+from abc import ABC, abstractmethod
+from dataclasses import asdict
+from traceback import format_exc
+from typing import Any, Callable
+
+import aiohttp
+
+from imcity_template import (
+    DEFAULT_TIMEOUT,
+    STANDARD_HEADERS,
+    Decoder,
+    LevelBook,
+    OrderBook,
+    OrderRequest,
+    OrderResponse,
+    Product,
+    Trade,
+    json_decoder,
+)
+from sse import SSEParser
+
+
+class AsyncBaseBot(ABC):
+    """
+    asyncio counterpart of `imcity_template.BaseBot`.
+
+    The market stream and all REST calls share one event loop and one pooled
+    `aiohttp.ClientSession`. Handlers may be plain functions or coroutines; to send
+    an order without holding up the next book update use `fire_order`, which
+    schedules the request and returns immediately.
+    """
+
+    username: str
+    _password: str
+    _cmi_url: str
+    _session: aiohttp.ClientSession | None = None
+    _stream_task: asyncio.Task | None = None
+    _auth_token: str | None = None
+
+    def __init__(
+        self,
+        cmi_url: str,
+        username: str,
+        password: str,
+        pool_size: int = 10,
+        timeout: float | tuple[float, float] = DEFAULT_TIMEOUT,
+        decoder: Decoder | str | None = None,
+    ):
+        self._cmi_url = cmi_url.rstrip("/")
+        self.username = username
+        self._password = password
+        self._pool_size = pool_size
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        self._timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        self._in_flight: set[asyncio.Task] = set()
+        self.books: dict[str, LevelBook] = {}
+        self._decode = json_decoder(decoder)
+
+    async def __aenter__(self) -> "AsyncBaseBot":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._pool_size),
+                timeout=self._timeout,
+                # Book snapshots arrive as a single `data:` line
+                read_bufsize=2**20,
+            )
+        return self._session
+
+    async def auth_token(self) -> str:
+        if self._auth_token is None:
+            self._auth_token = await self._authenticate()
+        return self._auth_token
+
+    async def start(
+        self, on_orderbook: Callable | None = None, on_trades: Callable | None = None
+    ) -> None:
+        """
+        Starts consuming market events as a task on the running event loop
+        """
+        if self._stream_task:
+            raise Exception(
+                "Bot already running. Please use the `stop()` method before trying again."
+            )
+
+        await self.auth_token()
+        self._stream_task = asyncio.create_task(
+            self._run_stream(
+                on_orderbook or self.on_orderbook, on_trades or self.on_trades
+            )
+        )
+
+    async def stop(self) -> None:
+        """
+        Stops the market stream and waits for outstanding orders
+        """
+        if self._stream_task:
+            self._stream_task.cancel()
+            try:
+                await self._stream_task
+            except asyncio.CancelledError:
+                pass
+            self._stream_task = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def close(self) -> None:
+        await self.stop()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @abstractmethod
+    def on_orderbook(self, orderbook: OrderBook):
+        raise NotImplementedError("You must implement the on_orderbook method!")
+
+    @abstractmethod
+    def on_trades(self, trades: list[Trade]):
+        raise NotImplementedError("You must implement the on_trades method!")
+
+    async def _get_headers(self) -> dict[str, str]:
+        return {**STANDARD_HEADERS, "Authorization": await self.auth_token()}
+
+    async def _run_stream(self, handle_orderbook: Callable, handle_trades: Callable):
+        while True:
+            try:
+                await self._consume_stream(handle_orderbook, handle_trades)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                print("Encountered an error. Trying to restart SSE client...")
+                print(format_exc())
+                await asyncio.sleep(1)
+
+    async def _consume_stream(
+        self, handle_orderbook: Callable, handle_trades: Callable
+    ) -> None:
+        headers = {
+            "Authorization": await self.auth_token(),
+            "Accept": "text/event-stream; charset=utf-8",
+        }
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=self._timeout.sock_connect, sock_read=30
+        )
+        async with self.session.get(
+            f"{self._cmi_url}/api/market/stream", headers=headers, timeout=timeout
+        ) as response:
+            response.raise_for_status()
+            parser = SSEParser()
+            async for chunk in response.content.iter_any():
+                for event in parser.feed(chunk):
+                    await self._dispatch(
+                        event.event, event.data, handle_orderbook, handle_trades
+                    )
+
+    async def _dispatch(
+        self,
+        event: str,
+        data: bytes,
+        handle_orderbook: Callable,
+        handle_trades: Callable,
+    ) -> None:
+        if event == "order":
+            orderbook = self._decode(data)
+            product = orderbook["productsymbol"]
+            book = self.books.get(product)
+            if book is None:
+                book = self.books[product] = LevelBook(product, orderbook["tickSize"])
+            book.update(orderbook)
+            result = handle_orderbook(book.snapshot())
+        elif event == "trade":
+            result = handle_trades(self._decode(data))
+        else:
+            return
+        if inspect.isawaitable(result):
+            await result
+
+    def fire_order(self, order_request: OrderRequest) -> asyncio.Task:
+        """
+        Schedules `send_order` without waiting for the response
+        """
+        task = asyncio.create_task(self.send_order(order_request))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+        return task
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    async def send_order(self, order_request: OrderRequest) -> OrderResponse | None:
+        payload = asdict(order_request)
+        url = f"{self._cmi_url}/api/order"
+        async with self.session.post(
+            url, json=payload, headers=await self._get_headers()
+        ) as response:
+            if response.status == 200:
+                return OrderResponse(
+                    **await response.json(content_type=None, loads=self._decode)
+                )
+            print(
+                f"Failed to send order, {order_request}, with response {await response.read()}"
+            )
+
+    async def send_mass_orders(
+        self, order_requests: list[OrderRequest]
+    ) -> list[OrderResponse | None]:
+        return list(await asyncio.gather(*map(self.send_order, order_requests)))
+
+    async def request_all_orders(self) -> list[dict] | None:
+        return await self._get_json(
+            f"{self._cmi_url}/api/order/current-user", "Failed to get all orders"
+        )
+
+    async def cancel_order_by_id(self, order_id: str) -> dict | None:
+        url = f"{self._cmi_url}/api/order/{order_id}"
+        async with self.session.delete(
+            url, headers=await self._get_headers()
+        ) as response:
+            if response.status == 200:
+                return await response.json(content_type=None, loads=self._decode)
+            print(f"Failed to cancel order: {await response.read()}")
+
+    async def cancel_order(self, product: str, price: float) -> dict | None:
+        url = f"{self._cmi_url}/api/order?product={product}&price={price}"
+        async with self.session.delete(
+            url, headers=await self._get_headers()
+        ) as response:
+            if response.status == 200:
+                return await response.json(content_type=None, loads=self._decode)
+            print(f"Failed to cancel order: {await response.read()}")
+
+    async def cancel_all_orders(self) -> None:
+        orders = await self.request_all_orders() or []
+        await asyncio.gather(
+            *(self.cancel_order_by_id(order["id"]) for order in orders)
+        )
+
+    async def request_all_products(self) -> list[Product] | None:
+        products = await self._get_json(
+            f"{self._cmi_url}/api/product", "Failed to get all products"
+        )
+        if products is not None:
+            return [Product(**product) for product in products]
+
+    async def request_positions(self) -> dict[str, int] | None:
+        positions = await self._get_json(
+            f"{self._cmi_url}/api/position/current-user", "Failed to get positions"
+        )
+        if positions is not None:
+            return {position["product"]: position["volume"] for position in positions}
+
+    async def request_net_positions(self) -> dict[str, int] | None:
+        positions = await self._get_json(
+            f"{self._cmi_url}/api/position/current-user",
+            "Failed to get net positions for user",
+        )
+        if positions is not None:
+            return {
+                position["product"]: position["netPosition"] for position in positions
+            }
+
+    async def _get_json(self, url: str, error: str) -> Any:
+        async with self.session.get(url, headers=await self._get_headers()) as response:
+            if response.status == 200:
+                return await response.json(content_type=None, loads=self._decode)
+            print(f"{error}: {await response.read()}")
+
+    async def _authenticate(self) -> str:
+        auth = {"username": self.username, "password": self._password}
+        url = f"{self._cmi_url}/api/user/authenticate"
+        async with self.session.post(
+            url, headers=STANDARD_HEADERS, json=auth
+        ) as response:
+            response.raise_for_status()
+            return response.headers["Authorization"]
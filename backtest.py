@@ -0,0 +1,557 @@
+"""
+Event-driven backtests of `BaseBot` subclasses on recorded market data.
+
+Recorded events, either raw journals written by `tickstore.EventJournal` or the
+top-of-book `.ticks` files of `tickstore.TickRecorder`, are streamed in time order
+through the bot's unchanged `on_orderbook`/`on_trades` handlers. The bot's REST
+methods are replaced on the instance by a `SimulatedBroker`, which fills orders
+against the recorded book and tracks positions and PnL per product:
+
+    python backtest.py --journal events-*.jsonl --processes 4
+"""
+
+import argparse
+import glob
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import partial
+from multiprocessing import Pool
+from operator import itemgetter
+from typing import Any, Callable, Iterable, Iterator
+
+from exchange_sim import RestingOrder
+from imcity_template import (
+    AccountMirror,
+    BaseBot,
+    LevelBook,
+    OrderBook,
+    OrderLevels,
+    OrderRequest,
+    OrderResponse,
+    Product,
+    Side,
+)
+from rolling import BreakoutTracker
+from tickstore import TickStore, read_journal
+import utils
+
+# (local time, "order" | "trade", payload as sent by the exchange)
+Event = tuple[float, str, Any]
+_event_time = itemgetter(0)
+
+# REST methods of `BaseBot` that the broker takes over
+BROKER_METHODS = (
+    "send_order",
+    "send_mass_orders",
+    "request_all_orders",
+    "cancel_order_by_id",
+    "cancel_order",
+    "cancel_mass_orders",
+    "cancel_all_orders",
+    "request_orderbook",
+    "request_all_products",
+    "request_positions",
+    "request_net_positions",
+)
+
+
+def journal_events(paths: Iterable[str]) -> Iterator[Event]:
+    """
+    Events of several journal files merged in time order, read lazily
+    """
+    return heapq.merge(*map(read_journal, paths), key=_event_time)
+
+
+def _product_ticks(
+    directory: str, product: str, tick_size: float, chunk_size: int
+) -> Iterator[Event]:
+    ticks = TickStore.open(directory, product).ticks
+    # Converting chunk by chunk keeps memory bounded for long recordings
+    for start in range(0, len(ticks), chunk_size):
+        for t, _, bid, ask, bid_volume, ask_volume in ticks[
+            start : start + chunk_size
+        ].tolist():
+            yield t, "order", {
+                "productsymbol": product,
+                "tickSize": tick_size,
+                "buyOrders": {str(bid): {"marketVolume": bid_volume, "userVolume": 0}},
+                "sellOrders": {str(ask): {"marketVolume": ask_volume, "userVolume": 0}},
+            }
+
+
+def tick_events(
+    directory: str,
+    products: Iterable[str] = utils.PRODUCTS,
+    tick_size: float = 0.0,
+    chunk_size: int = 65_536,
+) -> Iterator[Event]:
+    """
+    Recorded ticks as one-level "order" events, merged in time order.
+    The tick size is not recorded and is reported as `tick_size`.
+    """
+    return heapq.merge(
+        *(
+            _product_ticks(directory, product, tick_size, chunk_size)
+            for product in products
+        ),
+        key=_event_time,
+    )
+
+
+@dataclass(frozen=True)
+class EventSource:
+    """
+    Recorded events to replay. Only paths are stored, so a source can be sent to
+    worker processes, each of which streams the files itself.
+    """
+
+    journals: tuple[str, ...] = ()
+    tick_directory: str | None = None
+    products: tuple[str, ...] = utils.PRODUCTS
+    tick_size: float = 0.0
+    start: float = float("-inf")
+    end: float = float("inf")
+
+    def events(self) -> Iterator[Event]:
+        streams = []
+        if self.journals:
+            streams.append(journal_events(self.journals))
+        if self.tick_directory is not None:
+            streams.append(
+                tick_events(self.tick_directory, self.products, self.tick_size)
+            )
+        for event in heapq.merge(*streams, key=_event_time):
+            if event[0] < self.start:
+                continue
+            if event[0] >= self.end:
+                break
+            yield event
+
+
+def _timestamp(t: float) -> str:
+    return (
+        datetime.fromtimestamp(t, timezone.utc)
+        .isoformat(timespec="microseconds")
+        .replace("+00:00", "Z")
+    )
+
+
+def _with_own(side, own: dict[float, int], descending: bool) -> OrderLevels:
+    # Recorded own volume belongs to the live session, replace it with ours
+    if not own and not any(side.own_volumes):
+        return side.top()
+    market = {
+        price: volume - own_volume
+        for price, volume, own_volume in zip(
+            side.prices, side.volumes, side.own_volumes
+        )
+    }
+    prices = sorted(
+        (
+            price
+            for price in market.keys() | own.keys()
+            if market.get(price) or price in own
+        ),
+        reverse=descending,
+    )
+    return OrderLevels(
+        prices,
+        [market.get(price, 0) + own.get(price, 0) for price in prices],
+        [own.get(price, 0) for price in prices],
+    )
+
+
+class SimulatedBroker:
+    """
+    Stands in for the exchange's REST API during a backtest.
+
+    Incoming orders first trade against the recorded book at the book's prices.
+    The rest of the order rests and fills at its own price once a later book
+    crosses it, or a recorded trade prints through it. Liquidity taken from a
+    level stays taken until the next book of that product arrives. Fills are
+    queued as trades in the exchange's format and handed to `on_trades`.
+    Order changes are mirrored into `account`, as `BaseBot` does live.
+    """
+
+    def __init__(self, username: str, account: AccountMirror | None = None):
+        self.username = username
+        self.account = account or AccountMirror(username)
+        self.now = 0.0
+        self.books: dict[str, LevelBook] = {}
+        self.orders: dict[str, RestingOrder] = {}
+        self.positions: dict[str, int] = {}
+        self.cash: dict[str, float] = {}
+        self.fills = 0
+        self.own_trades: list[dict[str, Any]] = []
+        self._taken: dict[str, dict[tuple[str, float], int]] = {}
+        self._ids = itertools.count()
+
+    # Market side
+
+    def update_book(self, orderbook: dict[str, Any]) -> str:
+        product = orderbook["productsymbol"]
+        book = self.books.get(product)
+        if book is None:
+            book = self.books[product] = LevelBook(product, orderbook["tickSize"])
+        book.update(orderbook)
+        self._taken[product] = {}
+        for order in list(self._resting(product)):
+            self._match(order, passive=True)
+        return product
+
+    def on_market_trades(self, trades: list[dict[str, Any]]) -> None:
+        for trade in trades:
+            left = trade["volume"]
+            for order in list(self._resting(trade["product"])):
+                if left <= 0:
+                    break
+                through = (
+                    trade["price"] < order.price
+                    if order.side == Side.BUY
+                    else trade["price"] > order.price
+                )
+                if through:
+                    volume = min(left, order.volume)
+                    self._fill(order, order.price, volume)
+                    left -= volume
+
+    def snapshot(self, product: str) -> OrderBook:
+        """
+        Recorded book of `product` with our resting orders in it
+        """
+        book = self.books[product]
+        own = {Side.BUY: {}, Side.SELL: {}}
+        for order in self._resting(product):
+            levels = own[order.side]
+            levels[order.price] = levels.get(order.price, 0) + order.volume
+        return OrderBook(
+            product,
+            book.tick_size,
+            _with_own(book.bids, own[Side.BUY], descending=True),
+            _with_own(book.asks, own[Side.SELL], descending=False),
+            book.timestamp,
+            self.now,
+        )
+
+    def pnl(self) -> dict[str, float]:
+        """
+        Cash plus position marked to the last recorded mid price, per product
+        """
+        pnl = {}
+        for product, cash in self.cash.items():
+            book = self.books.get(product)
+            bid, ask = (book.best_bid, book.best_ask) if book else (None, None)
+            position = self.positions.get(product, 0)
+            if bid and ask:
+                pnl[product] = cash + position * (bid.price + ask.price) / 2
+            else:
+                pnl[product] = cash if position == 0 else float("nan")
+        return pnl
+
+    def _resting(self, product: str) -> Iterator[RestingOrder]:
+        return (order for order in self.orders.values() if order.product == product)
+
+    def _match(self, order: RestingOrder, passive: bool) -> None:
+        book = self.books.get(order.product)
+        if book is None:
+            return
+        buy = order.side == Side.BUY
+        side = book.asks if buy else book.bids
+        taken = self._taken.setdefault(order.product, {})
+        for price, volume, own_volume in zip(
+            side.prices, side.volumes, side.own_volumes
+        ):
+            if order.volume == 0 or (
+                price > order.price if buy else price < order.price
+            ):
+                break
+            key = (order.side, price)
+            available = volume - own_volume - taken.get(key, 0)
+            if available <= 0:
+                continue
+            filled = min(available, order.volume)
+            taken[key] = taken.get(key, 0) + filled
+            self._fill(order, order.price if passive else price, filled)
+
+    def _fill(self, order: RestingOrder, price: float, volume: int) -> None:
+        sign = 1 if order.side == Side.BUY else -1
+        self.positions[order.product] = (
+            self.positions.get(order.product, 0) + sign * volume
+        )
+        self.cash[order.product] = (
+            self.cash.get(order.product, 0.0) - sign * price * volume
+        )
+        order.volume -= volume
+        order.filled += volume
+        self.fills += 1
+        if order.volume == 0:
+            self.orders.pop(order.id, None)
+        self.own_trades.append(
+            {
+                "timestamp": _timestamp(self.now),
+                "product": order.product,
+                "buyer": self.username if sign > 0 else "market",
+                "seller": "market" if sign > 0 else self.username,
+                "volume": volume,
+                "price": price,
+            }
+        )
+
+    # REST API, with the signatures of `BaseBot`
+
+    def send_order(self, order_request: OrderRequest) -> OrderResponse | None:
+        if order_request.volume <= 0:
+            print(f"Failed to send order, {order_request}, with invalid volume")
+            return None
+        order = RestingOrder(
+            f"backtest-{next(self._ids)}",
+            self.username,
+            order_request.product,
+            Side(order_request.side),
+            order_request.price,
+            order_request.volume,
+            timestamp=_timestamp(self.now),
+        )
+        self.orders[order.id] = order
+        self._match(order, passive=False)
+        response = order.to_dict()
+        self.account.on_order(response)
+        return OrderResponse(**response)
+
+    def send_mass_orders(
+        self, order_requests: list[OrderRequest]
+    ) -> list[OrderResponse | None]:
+        return list(map(self.send_order, order_requests))
+
+    def request_all_orders(self) -> list[dict]:
+        return [order.to_dict() for order in self.orders.values()]
+
+    def cancel_order_by_id(self, order_id: str) -> dict | None:
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            print(f"Failed to cancel order: {order_id} is not open")
+            return None
+        self.account.on_cancel(order_id)
+        return order.to_dict()
+
+    def cancel_order(self, product: str, price: float) -> dict | None:
+        cancelled = [
+            self.orders.pop(order.id)
+            for order in list(self._resting(product))
+            if order.price == price
+        ]
+        if not cancelled:
+            print(f"Failed to cancel order: no open order in {product} at {price}")
+            return None
+        self.account.on_cancel_at(product, price)
+        return cancelled[0].to_dict()
+
+    def cancel_mass_orders(self, order_ids: list[str]) -> list[dict | None]:
+        return list(map(self.cancel_order_by_id, order_ids))
+
+    def cancel_all_orders(self) -> None:
+        for order_id in self.orders:
+            self.account.on_cancel(order_id)
+        self.orders.clear()
+
+    def request_orderbook(self, product: str) -> OrderBook | None:
+        if product not in self.books:
+            print(f"Failed to get order book for {product}: nothing recorded yet")
+            return None
+        return self.snapshot(product)
+
+    def request_all_products(self) -> list[Product]:
+        return [
+            Product(product, book.tick_size, 0, 1)
+            for product, book in self.books.items()
+        ]
+
+    def request_positions(self) -> dict[str, int]:
+        return dict(self.positions)
+
+    def request_net_positions(self) -> dict[str, int]:
+        return dict(self.positions)
+
+
+@dataclass(frozen=True)
+class BacktestResult:
+    params: dict[str, Any]
+    events: int
+    seconds: float
+    fills: int
+    positions: dict[str, int] = field(default_factory=dict)
+    pnl: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def total_pnl(self) -> float:
+        return sum(self.pnl.values())
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.seconds if self.seconds else float("inf")
+
+
+class Backtester:
+    """
+    Replays `source` through `bot`, whose REST methods are taken over by a
+    `SimulatedBroker`. The bot is never started, so no SSE thread or connection is
+    opened. Handlers should take the current time from `OrderBook.received_at`,
+    which is the recorded time of the event.
+    """
+
+    def __init__(self, bot: BaseBot, source: EventSource):
+        self.bot = bot
+        self.source = source
+        self.broker = SimulatedBroker(bot.username, bot.account)
+        bot.account.seed([], {})
+        for name in BROKER_METHODS:
+            setattr(bot, name, getattr(self.broker, name))
+        # `auth_token` is a cached property, filling the cache skips authentication
+        bot.__dict__["auth_token"] = "Bearer backtest"
+
+    def run(self, params: dict[str, Any] | None = None) -> BacktestResult:
+        bot, broker = self.bot, self.broker
+        events = 0
+        start = time.perf_counter()
+        for t, event, data in self.source.events():
+            broker.now = t
+            if event == "order":
+                product = broker.update_book(data)
+                self._deliver_own_trades()
+                bot.on_orderbook(broker.snapshot(product))
+            elif event == "trade":
+                broker.on_market_trades(data)
+                bot.on_trades(data)
+            self._deliver_own_trades()
+            events += 1
+        return BacktestResult(
+            params or {},
+            events,
+            time.perf_counter() - start,
+            broker.fills,
+            dict(broker.positions),
+            broker.pnl(),
+        )
+
+    def _deliver_own_trades(self) -> None:
+        # Orders sent from `on_trades` may fill and queue further trades
+        while self.broker.own_trades:
+            trades, self.broker.own_trades = self.broker.own_trades, []
+            self.bot.account.on_trades(trades)
+            self.bot.on_trades(trades)
+
+
+def run_backtest(
+    factory: Callable[..., BaseBot], source: EventSource, params: dict[str, Any]
+) -> BacktestResult:
+    """
+    Backtests the bot `factory(**params)` on `source`
+    """
+    bot = factory(**params)
+    try:
+        return Backtester(bot, source).run(params)
+    finally:
+        bot.close()
+
+
+def parameter_grid(**values: Iterable[Any]) -> list[dict[str, Any]]:
+    """
+    Every combination of the given parameter values, e.g.
+    `parameter_grid(threshold=[1.01, 1.05], volume=[1, 5])`
+    """
+    names = list(values)
+    return [
+        dict(zip(names, combination))
+        for combination in itertools.product(*values.values())
+    ]
+
+
+def sweep(
+    factory: Callable[..., BaseBot],
+    source: EventSource,
+    grid: Iterable[dict[str, Any]],
+    processes: int | None = None,
+) -> list[BacktestResult]:
+    """
+    Runs one backtest per parameter set on a process pool, results in grid order.
+    `factory` must be picklable, e.g. a `BaseBot` subclass or a `functools.partial`.
+    """
+    jobs = [(factory, source, params) for params in grid]
+    if processes == 1:
+        return list(itertools.starmap(run_backtest, jobs))
+    with Pool(processes) as pool:
+        return pool.starmap(run_backtest, jobs, chunksize=1)
+
+
+class BreakoutBot(BaseBot):
+    """
+    Takes the touch when the book breaks out of its rolling range, as in `logbot.py`
+    """
+
+    def __init__(
+        self,
+        *args,
+        threshold: float = 1.05,
+        window: float = 300,
+        volume: int = 1,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.volume = volume
+        self.window = window
+        self.tracker = BreakoutTracker(windows=(window,), threshold=threshold)
+
+    def on_orderbook(self, orderbook: OrderBook):
+        buy, sell = orderbook.buy_orders, orderbook.sell_orders
+        if not buy or not sell:
+            return
+        product, t = orderbook.product, orderbook.received_at
+        bid, ask = buy.prices[0], sell.prices[0]
+        signal = self.tracker.check(product, t, bid, ask, window=self.window)
+        if signal == "sell":
+            self.send_order(OrderRequest(product, bid, Side.SELL, self.volume))
+        elif signal == "buy":
+            self.send_order(OrderRequest(product, ask, Side.BUY, self.volume))
+        self.tracker.update(product, t, bid, ask)
+
+    def on_trades(self, trades: list[dict]):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest BreakoutBot on recordings")
+    parser.add_argument(
+        "--journal", nargs="*", default=[], help="event journal files (globs)"
+    )
+    parser.add_argument("--ticks", help="directory with recorded .ticks files")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument(
+        "--thresholds", type=float, nargs="+", default=[1.01, 1.02, 1.05]
+    )
+    parser.add_argument("--windows", type=float, nargs="+", default=[60, 300])
+    args = parser.parse_args()
+
+    journals = tuple(
+        sorted(path for pattern in args.journal for path in glob.glob(pattern))
+    )
+    source = EventSource(journals=journals, tick_directory=args.ticks)
+    factory = partial(BreakoutBot, "http://backtest", "backtest", "")
+    grid = parameter_grid(threshold=args.thresholds, window=args.windows)
+
+    start = time.perf_counter()
+    results = sweep(factory, source, grid, args.processes)
+    elapsed = time.perf_counter() - start
+    for result in sorted(results, key=lambda result: -result.total_pnl):
+        print(
+            f"{result.params}: pnl {result.total_pnl:,.2f}, fills {result.fills}, "
+            f"{result.events_per_second:,.0f} events/s"
+        )
+    events = sum(result.events for result in results)
+    print(f"{events:,} events in {elapsed:.2f}s, {events / elapsed:,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Microbenchmark of the JSON decoders in `imcity_template.JSON_DECODERS` on market
+event payloads, decoding alone and decoding plus applying books to a `LevelBook`:
+
+    python decode_bench.py events-2025-11-22.jsonl
+"""
+
+import argparse
+import json
+import random
+import time
+
+from imcity_template import JSON_DECODERS, LevelBook
+from tickstore import read_journal
+from utils import PRODUCTS
+
+
+def recorded_payloads(paths: list[str], limit: int) -> list[tuple[str, bytes]]:
+    payloads = []
+    for path in paths:
+        for _, event, data in read_journal(path):
+            payloads.append((event, json.dumps(data).encode()))
+            if len(payloads) >= limit:
+                return payloads
+    return payloads
+
+
+def synthetic_payloads(count: int, levels: int = 20) -> list[tuple[str, bytes]]:
+    """
+    Book events of random walks with `levels` levels a side, like the SSE stream
+    """
+    rng = random.Random(0)
+    mids = {product: 1000.0 for product in PRODUCTS}
+    payloads = []
+    for _ in range(count):
+        product = rng.choice(PRODUCTS)
+        mid = mids[product] = mids[product] + rng.choice((-1.0, 0.0, 1.0))
+        book = {
+            "productsymbol": product,
+            "tickSize": 1.0,
+            "timestamp": "2025-11-22T12:00:00.000000Z",
+            "buyOrders": {
+                str(mid - i): {"marketVolume": rng.randint(1, 50), "userVolume": 0}
+                for i in range(1, levels + 1)
+            },
+            "sellOrders": {
+                str(mid + i): {"marketVolume": rng.randint(1, 50), "userVolume": 0}
+                for i in range(1, levels + 1)
+            },
+        }
+        payloads.append(("order", json.dumps(book).encode()))
+    return payloads
+
+
+def run(payloads: list[tuple[str, bytes]], repeat: int = 3) -> None:
+    for name, decode in JSON_DECODERS.items():
+        # Text, as a text-mode client would hand it over, and bytes, as the SSE parser does
+        for kind, data in (
+            ("str", [payload.decode() for _, payload in payloads]),
+            ("bytes", [payload for _, payload in payloads]),
+        ):
+            best = min(_time(lambda: list(map(decode, data))) for _ in range(repeat))
+            print(
+                f"{name:>7} {kind:>5} decode       {len(data) / best:>12,.0f} events/s"
+            )
+
+        def decode_and_apply():
+            books: dict[str, LevelBook] = {}
+            for event, payload in payloads:
+                data = decode(payload)
+                if event == "order":
+                    product = data["productsymbol"]
+                    book = books.get(product)
+                    if book is None:
+                        book = books[product] = LevelBook(product, data["tickSize"])
+                    book.update(data)
+                    book.snapshot()
+
+        best = min(_time(decode_and_apply) for _ in range(repeat))
+        print(f"{name:>7} bytes decode+book  {len(payloads) / best:>12,.0f} events/s")
+
+
+def _time(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON decoders")
+    parser.add_argument("journals", nargs="*", help="recorded event journals")
+    parser.add_argument("--events", type=int, default=50_000)
+    args = parser.parse_args()
+
+    payloads = (
+        recorded_payloads(args.journals, args.events)
+        if args.journals
+        else synthetic_payloads(args.events)
+    )
+    print(f"{len(payloads):,} events, decoders: {', '.join(JSON_DECODERS)}")
+    run(payloads)
+
+
+if __name__ == "__main__":
+    main()
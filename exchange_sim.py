@@ -0,0 +1,693 @@
+"""
+Local stand-in for the CMI exchange.
+
+Implements the REST endpoints and the `/api/market/stream` SSE feed used by
+`imcity_template.BaseBot` on top of a price-time priority matching engine, so bots
+can be tested and benchmarked without the real exchange:
+
+    python exchange_sim.py --orders 2000 --replay . --rate 500
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import multiprocessing.synchronize
+import queue
+import socket
+import statistics
+import time
+from bisect import bisect_left, insort
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from tickstore import TickStore
+
+DEFAULT_PRODUCTS = [
+    "1_Eisbach",
+    "2_Eisbach_Call",
+    "3_Weather",
+    "4_Weather",
+    "5_Flights",
+    "6_Airport",
+    "7_ETF",
+    "8_ETF_Strangle",
+]
+REPLAY_USER = "replay"
+
+
+def now_timestamp() -> str:
+    return (
+        datetime.now(timezone.utc)
+        .isoformat(timespec="microseconds")
+        .replace("+00:00", "Z")
+    )
+
+
+@dataclass(slots=True)
+class RestingOrder:
+    id: str
+    user: str
+    product: str
+    side: str
+    price: float
+    volume: int
+    filled: int = 0
+    timestamp: str = field(default_factory=now_timestamp)
+
+    @property
+    def status(self) -> str:
+        if self.volume == 0:
+            return "FILLED"
+        return "PART_FILLED" if self.filled else "ACTIVE"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "product": self.product,
+            "side": self.side,
+            "price": self.price,
+            "volume": self.volume,
+            "filled": self.filled,
+            "user": self.user,
+            "timestamp": self.timestamp,
+            "targetUser": None,
+            "message": None,
+        }
+
+
+class _ProductBook:
+    """
+    Price levels of one product; each level is a FIFO queue of resting orders
+    """
+
+    def __init__(self):
+        # Both price lists ascending: best bid is the last, best ask the first
+        self.bid_prices: list[float] = []
+        self.ask_prices: list[float] = []
+        self.bids: dict[float, deque[RestingOrder]] = {}
+        self.asks: dict[float, deque[RestingOrder]] = {}
+
+    def side(self, side: str) -> tuple[list[float], dict[float, deque[RestingOrder]]]:
+        return (
+            (self.bid_prices, self.bids)
+            if side == "BUY"
+            else (self.ask_prices, self.asks)
+        )
+
+    def add(self, order: RestingOrder) -> None:
+        prices, levels = self.side(order.side)
+        level = levels.get(order.price)
+        if level is None:
+            level = levels[order.price] = deque()
+            insort(prices, order.price)
+        level.append(order)
+
+    def remove(self, order: RestingOrder) -> None:
+        prices, levels = self.side(order.side)
+        level = levels[order.price]
+        level.remove(order)
+        if not level:
+            del levels[order.price]
+            del prices[bisect_left(prices, order.price)]
+
+
+class MatchingEngine:
+    """
+    Continuous double auction with price-time priority.
+
+    Incoming orders trade against the opposite side at the resting order's price;
+    the unfilled remainder rests on the book until cancelled (good for day).
+    """
+
+    def __init__(self, products: list[str], tick_size: float = 1.0):
+        self.products = {product: tick_size for product in products}
+        self._books = {product: _ProductBook() for product in products}
+        self._orders: dict[str, RestingOrder] = {}
+        self._ids = itertools.count(1)
+        self.trades: list[dict[str, Any]] = []
+        # user -> product -> (position, cash)
+        self.positions: dict[str, dict[str, list[float]]] = {}
+
+    def submit(
+        self, user: str, product: str, side: str, price: float, volume: int
+    ) -> tuple[RestingOrder, list[dict[str, Any]]]:
+        if product not in self._books:
+            raise KeyError(product)
+        book = self._books[product]
+        order = RestingOrder(str(next(self._ids)), user, product, side, price, volume)
+        trades = []
+        if side == "BUY":
+            prices, levels = book.ask_prices, book.asks
+            crosses = lambda best: best <= price
+            best = lambda: prices[0]
+        else:
+            prices, levels = book.bid_prices, book.bids
+            crosses = lambda best: best >= price
+            best = lambda: prices[-1]
+
+        while order.volume and prices and crosses(best()):
+            level_price = best()
+            level = levels[level_price]
+            resting = level[0]
+            quantity = min(order.volume, resting.volume)
+            for filled_order in (order, resting):
+                filled_order.volume -= quantity
+                filled_order.filled += quantity
+            buyer, seller = (
+                (user, resting.user) if side == "BUY" else (resting.user, user)
+            )
+            trades.append(
+                {
+                    "timestamp": now_timestamp(),
+                    "product": product,
+                    "buyer": buyer,
+                    "seller": seller,
+                    "aggressor": user,
+                    "volume": quantity,
+                    "price": level_price,
+                }
+            )
+            self._book_fill(buyer, product, quantity, level_price)
+            self._book_fill(seller, product, -quantity, level_price)
+            if resting.volume == 0:
+                level.popleft()
+                del self._orders[resting.id]
+                if not level:
+                    del levels[level_price]
+                    prices.remove(level_price)
+
+        if order.volume:
+            book.add(order)
+            self._orders[order.id] = order
+        self.trades.extend(trades)
+        return order, trades
+
+    def _book_fill(self, user: str, product: str, quantity: int, price: float) -> None:
+        position = self.positions.setdefault(user, {}).setdefault(product, [0, 0.0])
+        position[0] += quantity
+        position[1] -= quantity * price
+
+    def cancel(self, user: str, order_id: str) -> RestingOrder | None:
+        order = self._orders.get(order_id)
+        if order is None or order.user != user:
+            return None
+        del self._orders[order_id]
+        self._books[order.product].remove(order)
+        return order
+
+    def cancel_at(self, user: str, product: str, price: float) -> list[RestingOrder]:
+        return [
+            self.cancel(user, order.id)
+            for order in list(self._orders.values())
+            if order.user == user and order.product == product and order.price == price
+        ]
+
+    def open_orders(self, user: str) -> list[RestingOrder]:
+        return [order for order in self._orders.values() if order.user == user]
+
+    def book_levels(
+        self, product: str, user: str
+    ) -> tuple[dict[float, tuple[int, int]], dict[float, tuple[int, int]]]:
+        """
+        (market volume, user volume) per price for both sides of `product`
+        """
+        book = self._books[product]
+        return tuple(
+            {
+                price: (
+                    sum(order.volume for order in level),
+                    sum(order.volume for order in level if order.user == user),
+                )
+                for price, level in levels.items()
+            }
+            for levels in (book.bids, book.asks)
+        )
+
+    def book_event(self, product: str, user: str) -> dict[str, Any]:
+        """
+        Order book in the format of the SSE "order" event
+        """
+        bids, asks = self.book_levels(product, user)
+        return {
+            "productsymbol": product,
+            "tickSize": self.products[product],
+            "timestamp": now_timestamp(),
+            "buyOrders": {
+                str(price): {"marketVolume": market, "userVolume": own}
+                for price, (market, own) in bids.items()
+            },
+            "sellOrders": {
+                str(price): {"marketVolume": market, "userVolume": own}
+                for price, (market, own) in asks.items()
+            },
+        }
+
+
+class SimulatedExchange:
+    """
+    Matching engine served over HTTP on a local port.
+
+    `start()` serves in a background thread; `url` is what a bot uses as `cmi_url`.
+    Every subscriber of the market stream gets a book event after each change of a
+    product (with its own volumes) and every trade.
+    """
+
+    def __init__(
+        self,
+        products: list[str] | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        tick_size: float = 1.0,
+    ):
+        self.engine = MatchingEngine(products or DEFAULT_PRODUCTS, tick_size)
+        self.lock = Lock()
+        self._tokens: dict[str, str] = {}
+        self._subscribers: dict[queue.Queue, str] = {}
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread: Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "SimulatedExchange":
+        self._thread = Thread(
+            target=self._server.serve_forever, name="SimulatedExchange", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        with self.lock:
+            for subscriber in self._subscribers:
+                subscriber.put(None)
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "SimulatedExchange":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def authenticate(self, username: str) -> str:
+        token = f"Bearer {username}-{len(self._tokens) + 1}"
+        self._tokens[token] = username
+        return token
+
+    def user(self, authorization: str | None) -> str | None:
+        return self._tokens.get(authorization or "")
+
+    def subscribe(self, user: str) -> queue.Queue:
+        subscriber = queue.Queue()
+        with self.lock:
+            self._subscribers[subscriber] = user
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue) -> None:
+        with self.lock:
+            self._subscribers.pop(subscriber, None)
+
+    def submit(
+        self, user: str, product: str, side: str, price: float, volume: int
+    ) -> RestingOrder:
+        with self.lock:
+            order, trades = self.engine.submit(user, product, side, price, volume)
+            self._publish(product, trades)
+            return order
+
+    def cancel(self, user: str, order_id: str) -> RestingOrder | None:
+        with self.lock:
+            order = self.engine.cancel(user, order_id)
+            if order:
+                self._publish(order.product)
+            return order
+
+    def cancel_at(self, user: str, product: str, price: float) -> list[RestingOrder]:
+        with self.lock:
+            orders = self.engine.cancel_at(user, product, price)
+            if orders:
+                self._publish(product)
+            return orders
+
+    def _publish(self, product: str, trades: list[dict] | None = None) -> None:
+        # Called with `self.lock` held, so every subscriber sees the same order
+        for subscriber, user in self._subscribers.items():
+            subscriber.put(("order", self.engine.book_event(product, user)))
+            if trades:
+                subscriber.put(("trade", trades))
+
+
+def _make_handler(exchange: SimulatedExchange):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately; without this every response
+        # waits for the client's delayed ACK
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, body: Any, status: int = 200, headers=None) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _read_json(self) -> Any:
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length)) if length else None
+
+        def _user(self) -> str | None:
+            user = exchange.user(self.headers.get("Authorization"))
+            if user is None:
+                self._send_json({"message": "Unauthorized"}, 401)
+            return user
+
+        def do_POST(self):
+            path = urlsplit(self.path).path
+            body = self._read_json()
+            if path == "/api/user/authenticate":
+                token = exchange.authenticate(body["username"])
+                return self._send_json({}, headers={"Authorization": token})
+            if (user := self._user()) is None:
+                return
+            if path == "/api/order":
+                try:
+                    order = exchange.submit(
+                        user,
+                        body["product"],
+                        body["side"],
+                        float(body["price"]),
+                        int(body["volume"]),
+                    )
+                except KeyError:
+                    return self._send_json({"message": "Unknown product"}, 400)
+                return self._send_json(order.to_dict())
+            self._send_json({"message": "Not found"}, 404)
+
+        def do_DELETE(self):
+            url = urlsplit(self.path)
+            if (user := self._user()) is None:
+                return
+            if url.path == "/api/order":
+                query = parse_qs(url.query)
+                orders = exchange.cancel_at(
+                    user, query["product"][0], float(query["price"][0])
+                )
+                return self._send_json([order.to_dict() for order in orders])
+            if url.path.startswith("/api/order/"):
+                order = exchange.cancel(user, url.path.rsplit("/", 1)[1])
+                if order is None:
+                    return self._send_json({"message": "Order not found"}, 404)
+                return self._send_json(order.to_dict())
+            self._send_json({"message": "Not found"}, 404)
+
+        def do_GET(self):
+            path = urlsplit(self.path).path
+            if (user := self._user()) is None:
+                return
+            engine = exchange.engine
+            if path == "/api/market/stream":
+                return self._stream(user)
+            with exchange.lock:
+                if path == "/api/order/current-user":
+                    body = [order.to_dict() for order in engine.open_orders(user)]
+                elif path == "/api/position/current-user":
+                    body = [
+                        {
+                            "product": product,
+                            "volume": position,
+                            "netPosition": position,
+                        }
+                        for product, (position, _) in engine.positions.get(
+                            user, {}
+                        ).items()
+                    ]
+                elif path == "/api/product":
+                    body = [
+                        {
+                            "symbol": product,
+                            "tickSize": tick_size,
+                            "startingPrice": 0,
+                            "contractSize": 1,
+                        }
+                        for product, tick_size in engine.products.items()
+                    ]
+                elif path == "/api/trade":
+                    body = list(engine.trades)
+                elif path.startswith("/api/product/") and path.endswith(
+                    "/order-book/current-user"
+                ):
+                    product = path.split("/")[3]
+                    if product not in engine.products:
+                        return self._send_json({"message": "Unknown product"}, 404)
+                    bids, asks = engine.book_levels(product, user)
+                    body = {
+                        "tickSize": engine.products[product],
+                        "buy": [
+                            {"price": price, "volume": market, "userVolume": own}
+                            for price, (market, own) in sorted(
+                                bids.items(), reverse=True
+                            )
+                        ],
+                        "sell": [
+                            {"price": price, "volume": market, "userVolume": own}
+                            for price, (market, own) in sorted(asks.items())
+                        ],
+                    }
+                else:
+                    return self._send_json({"message": "Not found"}, 404)
+            self._send_json(body)
+
+        def _stream(self, user: str) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            subscriber = exchange.subscribe(user)
+            try:
+                while True:
+                    try:
+                        event = subscriber.get(timeout=10)
+                    except queue.Empty:
+                        self._write_chunk(b": keep-alive\n\n")
+                        continue
+                    if event is None:
+                        self._write_chunk(b"")
+                        return
+                    name, data = event
+                    self._write_chunk(
+                        f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+                    )
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                exchange.unsubscribe(subscriber)
+                self.close_connection = True
+
+        def _write_chunk(self, data: bytes) -> None:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+    return Handler
+
+
+def replay_ticks(
+    exchange: SimulatedExchange,
+    directory: str,
+    products: list[str] | None = None,
+    speed: float | None = 1.0,
+    rate: float | None = None,
+) -> int:
+    """
+    Replays ticks recorded by `tickstore.TickRecorder` as quotes of a replay user.
+
+    For every tick the replay user's previous quotes in that product are cancelled
+    and the recorded best bid and ask are placed. Ticks are paced by their recorded
+    time gaps divided by `speed`, or at a fixed `rate` per second; with neither,
+    they are sent as fast as possible. Returns the number of ticks replayed.
+    """
+    products = products or list(exchange.engine.products)
+    arrays = [
+        (product, TickStore.open(directory, product).ticks) for product in products
+    ]
+    arrays = [(product, ticks) for product, ticks in arrays if len(ticks)]
+    if not arrays:
+        return 0
+    times = np.concatenate([ticks["t"] for _, ticks in arrays])
+    owners = np.concatenate(
+        [np.full(len(ticks), i) for i, (_, ticks) in enumerate(arrays)]
+    )
+    rows = np.concatenate([np.arange(len(ticks)) for _, ticks in arrays])
+    order = np.argsort(times, kind="stable")
+
+    quotes: dict[str, list[str]] = {}
+    start, first = time.perf_counter(), times[order[0]]
+    for n, i in enumerate(order):
+        if rate:
+            delay = start + n / rate - time.perf_counter()
+        elif speed:
+            delay = start + (times[i] - first) / speed - time.perf_counter()
+        else:
+            delay = 0
+        if delay > 0:
+            time.sleep(delay)
+        product, ticks = arrays[owners[i]]
+        tick = ticks[rows[i]]
+        for order_id in quotes.pop(product, []):
+            exchange.cancel(REPLAY_USER, order_id)
+        if not tick["bid"] < tick["ask"]:
+            continue
+        quotes[product] = [
+            exchange.submit(
+                REPLAY_USER, product, side, float(price), max(1, int(volume))
+            ).id
+            for side, price, volume in (
+                ("BUY", tick["bid"], tick["bid_volume"]),
+                ("SELL", tick["ask"], tick["ask_volume"]),
+            )
+        ]
+    return len(order)
+
+
+def _percentiles(values: list[float]) -> str:
+    if len(values) < 2:
+        return "n/a"
+    cuts = statistics.quantiles(values, n=100)
+    return f"p50 {cuts[49] * 1e3:.3f} ms, p99 {cuts[98] * 1e3:.3f} ms"
+
+
+def _serve(
+    port: int,
+    ready: multiprocessing.synchronize.Event,
+    replay: multiprocessing.synchronize.Event,
+    replayed: multiprocessing.synchronize.Event,
+    args: argparse.Namespace,
+) -> None:
+    with SimulatedExchange(port=port) as exchange:
+        ready.set()
+        replay.wait()
+        if args.replay:
+            start = time.perf_counter()
+            ticks = replay_ticks(
+                exchange, args.replay, speed=args.speed, rate=args.rate
+            )
+            print(f"replayed {ticks} ticks in {time.perf_counter() - start:.2f}s")
+        replayed.set()
+        # Keep serving until the benchmark terminates us
+        while True:
+            time.sleep(1)
+
+
+def main():
+    # Imported here so the simulator itself does not depend on the client
+    from imcity_template import BaseBot, OrderRequest, Side, parse_timestamp
+    from latency import LatencyRecorder
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark BaseBot against a local exchange"
+    )
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--replay", help="directory with recorded .ticks files")
+    parser.add_argument("--rate", type=float, help="replayed ticks per second")
+    parser.add_argument(
+        "--speed", type=float, default=None, help="replay time multiplier"
+    )
+    parser.add_argument(
+        "--serve", type=int, metavar="PORT", help="only run the exchange on PORT"
+    )
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        with SimulatedExchange(port=args.serve) as exchange:
+            print(f"Serving on {exchange.url}")
+            if args.replay:
+                replay_ticks(exchange, args.replay, speed=args.speed, rate=args.rate)
+            while True:
+                time.sleep(1)
+
+    class BenchmarkBot(BaseBot):
+        def __init__(self, *bot_args, **kwargs):
+            super().__init__(*bot_args, **kwargs)
+            self.books = 0
+            self.stream_latencies: list[float] = []
+
+        def on_orderbook(self, orderbook):
+            self.books += 1
+            if orderbook.timestamp and orderbook.received_at:
+                self.stream_latencies.append(
+                    orderbook.received_at - parse_timestamp(orderbook.timestamp)
+                )
+
+        def on_trades(self, trades):
+            pass
+
+    # The exchange runs in its own process so it does not share our GIL
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    ready, replay, replayed = (multiprocessing.Event() for _ in range(3))
+    server = multiprocessing.Process(
+        target=_serve, args=(port, ready, replay, replayed, args), daemon=True
+    )
+    server.start()
+    ready.wait()
+
+    bot = BenchmarkBot(
+        f"http://127.0.0.1:{port}",
+        "benchmark",
+        "",
+        pool_size=args.pool_size,
+        latency=LatencyRecorder(),
+    )
+    bot.start()
+    time.sleep(0.2)
+
+    requests = [
+        OrderRequest(
+            DEFAULT_PRODUCTS[i % len(DEFAULT_PRODUCTS)],
+            100.0 + i % 50,
+            Side.BUY if i % 2 else Side.SELL,
+            1,
+        )
+        for i in range(args.orders)
+    ]
+    start = time.perf_counter()
+    bot.send_mass_orders(requests)
+    elapsed = time.perf_counter() - start
+    print(
+        f"orders: {args.orders / elapsed:,.0f}/s, {_percentiles(bot.batch_latencies)}"
+    )
+    print(f"connections: {bot.connection_stats()}")
+
+    replay.set()
+    replayed.wait()
+    time.sleep(0.5)
+    print(
+        f"book events: {bot.books}, stream latency {_percentiles(bot.stream_latencies)}"
+    )
+    print(bot.latency.report())
+    bot.close()
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import cache
+from threading import Event, Lock, Thread
+from traceback import format_exc
+from typing import Callable
+
+import pandas as pd
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+# Open-Meteo variable names -> DataFrame column names used by the strategies
+COLUMN_NAMES = {"temperature_2m": "temperature", "relative_humidity_2m": "humidity"}
+MUNICH = (48.1374, 11.5755)
+
+
+@cache
+def _openmeteo_client():
+    # Imported lazily so the cache can be used with a stub fetcher without these
+    import openmeteo_requests
+    import requests_cache
+    from retry_requests import retry
+
+    # Setup the Open-Meteo API client with cache and retry on error, once per process
+    cache_session = requests_cache.CachedSession(".cache", expire_after=3600)
+    retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
+    return openmeteo_requests.Client(session=retry_session)
+
+
+def fetch_open_meteo(
+    latitude: float,
+    longitude: float,
+    variables: tuple[str, ...],
+    url: str = OPEN_METEO_URL,
+) -> pd.DataFrame:
+    """
+    Hourly forecast (and the past day) of `variables` in Fahrenheit,
+    indexed by naive UTC time
+    """
+    params = {
+        "latitude": latitude,
+        "longitude": longitude,
+        "hourly": list(variables),
+        "past_days": 1,
+        "forecast_days": 3,
+        "temperature_unit": "fahrenheit",
+    }
+    # Process first location. Add a for-loop for multiple locations or weather models
+    response = _openmeteo_client().weather_api(url, params=params)[0]
+    hourly = response.Hourly()
+
+    index = pd.date_range(
+        start=pd.to_datetime(hourly.Time(), unit="s", utc=True),
+        end=pd.to_datetime(hourly.TimeEnd(), unit="s", utc=True),
+        freq=pd.Timedelta(seconds=hourly.Interval()),
+        inclusive="left",
+    ).tz_localize(None)
+    return pd.DataFrame(
+        {
+            COLUMN_NAMES.get(variable, variable): hourly.Variables(i).ValuesAsNumpy()
+            for i, variable in enumerate(variables)
+        },
+        index=index,
+    )
+
+
+@dataclass(frozen=True)
+class ForecastKey:
+    latitude: float
+    longitude: float
+    variables: tuple[str, ...]
+    start: datetime
+    end: datetime
+
+    @property
+    def source(self) -> tuple[float, float, tuple[str, ...]]:
+        return self.latitude, self.longitude, self.variables
+
+
+@dataclass(frozen=True)
+class _Source:
+    frame: pd.DataFrame
+    fetched_at: float
+
+
+@dataclass(frozen=True)
+class ForecastWindow:
+    frame: pd.DataFrame
+    estimates: dict[str, float]
+    fetched_at: float
+
+
+@dataclass
+class _Watch:
+    estimators: dict[str, Callable[[pd.DataFrame], float]] = field(default_factory=dict)
+    window: ForecastWindow | None = None
+
+
+class ForecastCache:
+    """
+    Two-tier in-process forecast cache kept fresh by a background thread.
+
+    Tier one holds the raw forecast per location and variable set, refetched once
+    it is older than `ttl`. Tier two holds watched time windows sliced from it,
+    together with settlement estimates derived from each window. Readers only look
+    up what the refresher already computed and never wait on the network.
+    Both tiers are LRU-bounded by `max_entries`.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[..., pd.DataFrame] = fetch_open_meteo,
+        ttl: float = 900,
+        refresh_interval: float = 60,
+        max_entries: int = 32,
+    ):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.max_entries = max_entries
+        self._sources: OrderedDict[tuple, _Source] = OrderedDict()
+        self._watches: OrderedDict[ForecastKey, _Watch] = OrderedDict()
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread: Thread | None = None
+        # Separate from `_lock`, which the refresh thread takes while `stop` joins it
+        self._thread_lock = Lock()
+
+    def watch(
+        self,
+        key: ForecastKey,
+        estimators: dict[str, Callable[[pd.DataFrame], float]] | None = None,
+    ) -> None:
+        """
+        Keeps the window `key` and the named `estimators` over it up to date
+        """
+        with self._lock:
+            watch = self._watches.setdefault(key, _Watch())
+            if estimators:
+                watch.estimators.update(estimators)
+                watch.window = None
+            self._watches.move_to_end(key)
+            while len(self._watches) > self.max_entries:
+                self._watches.popitem(last=False)
+
+    def window(self, key: ForecastKey) -> ForecastWindow | None:
+        watch = self._watches.get(key)
+        return watch.window if watch else None
+
+    def frame(self, key: ForecastKey) -> pd.DataFrame | None:
+        window = self.window(key)
+        return window.frame if window else None
+
+    def estimate(self, key: ForecastKey, name: str) -> float | None:
+        window = self.window(key)
+        return window.estimates.get(name) if window else None
+
+    def refresh(self) -> None:
+        """
+        Refetches expired sources and recomputes windows whose source changed
+        """
+        with self._lock:
+            watches = list(self._watches.items())
+        for key, watch in watches:
+            source = self._source(key)
+            if (
+                watch.window is not None
+                and watch.window.fetched_at == source.fetched_at
+            ):
+                continue
+            frame = source.frame.loc[key.start : key.end]
+            watch.window = ForecastWindow(
+                frame,
+                {
+                    name: estimator(frame)
+                    for name, estimator in watch.estimators.items()
+                },
+                source.fetched_at,
+            )
+
+    def _source(self, key: ForecastKey) -> _Source:
+        source = self._sources.get(key.source)
+        if source is None or time.time() - source.fetched_at > self.ttl:
+            source = _Source(self._fetch(*key.source), time.time())
+            with self._lock:
+                self._sources[key.source] = source
+                while len(self._sources) > self.max_entries:
+                    self._sources.popitem(last=False)
+        with self._lock:
+            if key.source in self._sources:
+                self._sources.move_to_end(key.source)
+        return source
+
+    def start(self) -> None:
+        with self._thread_lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = Thread(target=self._run, name="ForecastCache", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._thread_lock:
+            self._stopped.set()
+            if self._thread is not None:
+                self._thread.join()
+                self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                print("Failed to refresh forecasts:")
+                print(format_exc())
+            self._stopped.wait(self.refresh_interval)
@@ -1,14 +1,16 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from tickstore import TickStore
+
 file = "8_ETF_Strangle"
 
-df = pd.read_csv(file, header=None)
+df = pd.DataFrame(TickStore.open(".", file).ticks)
 print(df)
 
 
-plt.plot(df[0], df[1], label="Buy price")
-plt.plot(df[0], df[2], label="Sell price")
+plt.plot(df["t"], df["bid"], label="Buy price")
+plt.plot(df["t"], df["ask"], label="Sell price")
 
 plt.xlabel("Column 0")
 plt.ylabel("Values")
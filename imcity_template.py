@@ -1,57 +1,71 @@
 import json
-from dataclasses import dataclass, asdict
+import random
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect_left
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timezone
 from enum import StrEnum
 from functools import cached_property
-from threading import Thread
-from typing import Any, Callable, Literal
+from threading import Condition, Event, Lock, Thread
+from time import perf_counter, perf_counter_ns, time
+from typing import TYPE_CHECKING, Any, Callable, Literal
 from abc import ABC, abstractmethod
 from traceback import format_exc
-from collections.abc import Mapping
+from types import MappingProxyType
+from collections import deque
+from collections.abc import Iterable, Mapping, Sequence
+from operator import neg
 
 import requests
-import sseclient
+from requests.adapters import HTTPAdapter
 
+from sse import SSEParser, read_chunks
 
-def check_if_right_sse_used():
-    # I don't have a better way to define if it is sseclient or sseclient-py
-    if "maxime.petazzoni" in sseclient.__email__:
-        return
+try:
+    import orjson
+except ImportError:
+    # Optional, only makes decoding faster
+    orjson = None
 
-    print(
-        """
-It looks like you have installed the wrong SSE client library.
-Please ensure you have installed `sseclient-py` and not `sseclient`.
-
-To fix this, follow these steps:
-
-1. If you have installed `sseclient`, uninstall it:
-    ```
-    pip uninstall sseclient
-    ```
-
-2. Install `sseclient-py`:
-    ```
-    pip install sseclient-py
-    ```
+if TYPE_CHECKING:
+    from latency import LatencyRecorder
+    from risk import RiskGate
+    from tickstore import EventJournal
 
-To avoid such issues, it's recommended to use a virtual environment and install dependencies from `requirements.txt`.
 
-Here's how you can set up a virtual environment and install the correct dependencies:
+STANDARD_HEADERS = {"Content-Type": "application/json; charset=utf-8"}
+# (connect, read) timeouts in seconds for REST calls
+DEFAULT_TIMEOUT = (3.05, 10.0)
 
-```
-python3 -m venv .
-source ./bin/activate
-pip3 install -r ./requirements.txt
-```
-"""
-    )
-    quit(1)
+# Turns the bytes (or text) of an SSE event or REST response into Python objects
+Decoder = Callable[[bytes | str], Any]
+JSON_DECODERS: dict[str, Decoder] = {"json": json.loads}
+if orjson is not None:
+    JSON_DECODERS["orjson"] = orjson.loads
+# The fastest decoder installed
+DEFAULT_DECODER: Decoder = JSON_DECODERS.get("orjson", json.loads)
 
 
-check_if_right_sse_used()
+def json_decoder(decoder: Decoder | str | None = None) -> Decoder:
+    """
+    Decoder by name from `JSON_DECODERS`, `DEFAULT_DECODER` for None
+    """
+    if decoder is None:
+        return DEFAULT_DECODER
+    if isinstance(decoder, str):
+        return JSON_DECODERS[decoder]
+    return decoder
 
 
-STANDARD_HEADERS = {"Content-Type": "application/json; charset=utf-8"}
+def parse_timestamp(timestamp: str) -> float:
+    """
+    Exchange timestamp (e.g. "2025-11-21T10:40:42.438180497Z") as UTC epoch seconds
+    """
+    # `datetime` only keeps microseconds, so the fraction is parsed separately
+    date, _, fraction = timestamp.removesuffix("Z").partition(".")
+    seconds = datetime.fromisoformat(date).replace(tzinfo=timezone.utc).timestamp()
+    return seconds + float(f"0.{fraction}") if fraction else seconds
 
 
 class DictLikeFrozenDataclassMapping(Mapping):
@@ -59,6 +73,8 @@ class DictLikeFrozenDataclassMapping(Mapping):
     Mixin class to allow frozen dataclasses behave like a dict
     """
 
+    __slots__ = ()
+
     def __getitem__(self, key: str) -> Any:
         return getattr(self, key)
 
@@ -99,19 +115,109 @@ class Trade(DictLikeFrozenDataclassMapping):
     price: float
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Order(DictLikeFrozenDataclassMapping):
     price: float
     volume: int
     own_volume: int
 
 
-@dataclass(frozen=True)
+class OrderLevels(Sequence):
+    """
+    Price levels of one side of a book, stored in contiguous arrays.
+
+    Behaves like a `list[Order]`; `Order` objects are only created when a level is
+    indexed or iterated.
+    """
+
+    __slots__ = ("prices", "volumes", "own_volumes")
+
+    def __init__(
+        self,
+        prices: Iterable[float] = (),
+        volumes: Iterable[int] = (),
+        own_volumes: Iterable[int] = (),
+    ):
+        self.prices = array("d", prices)
+        self.volumes = array("q", volumes)
+        self.own_volumes = array("q", own_volumes)
+
+    @classmethod
+    def from_orders(cls, orders: Iterable[Mapping[str, Any]]) -> "OrderLevels":
+        levels = cls()
+        for order in orders:
+            levels.prices.append(order["price"])
+            levels.volumes.append(order["volume"])
+            levels.own_volumes.append(order["own_volume"])
+        return levels
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return OrderLevels(
+                self.prices[index], self.volumes[index], self.own_volumes[index]
+            )
+        return Order(self.prices[index], self.volumes[index], self.own_volumes[index])
+
+    def __iter__(self):
+        return map(Order, self.prices, self.volumes, self.own_volumes)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, OrderLevels):
+            return (
+                self.prices == other.prices
+                and self.volumes == other.volumes
+                and self.own_volumes == other.own_volumes
+            )
+        if isinstance(other, Sequence):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def to_list(self) -> list[dict]:
+        return [
+            {"price": price, "volume": volume, "own_volume": own_volume}
+            for price, volume, own_volume in zip(
+                self.prices, self.volumes, self.own_volumes
+            )
+        ]
+
+
+@dataclass(frozen=True, slots=True)
 class OrderBook(DictLikeFrozenDataclassMapping):
     product: str
     tick_size: float
-    buy_orders: list[Order]
-    sell_orders: list[Order]
+    buy_orders: OrderLevels
+    sell_orders: OrderLevels
+    # Exchange-side event time, if the exchange sent one
+    timestamp: str | None = None
+    # Local `time.time()` when the event was read from the stream
+    received_at: float | None = None
+
+    def __post_init__(self):
+        # Accept plain lists of `Order`s (or dicts) for hand-built books
+        if not isinstance(self.buy_orders, OrderLevels):
+            object.__setattr__(
+                self, "buy_orders", OrderLevels.from_orders(self.buy_orders)
+            )
+        if not isinstance(self.sell_orders, OrderLevels):
+            object.__setattr__(
+                self, "sell_orders", OrderLevels.from_orders(self.sell_orders)
+            )
+
+    def to_dict(self) -> dict:
+        return {
+            "product": self.product,
+            "tick_size": self.tick_size,
+            "buy_orders": self.buy_orders.to_list(),
+            "sell_orders": self.sell_orders.to_list(),
+            "timestamp": self.timestamp,
+            "received_at": self.received_at,
+        }
 
 
 class Side(StrEnum):
@@ -142,14 +248,578 @@ class OrderResponse:
     message: str | None
 
 
+class _BookSide:
+    """
+    One side of a price level book, kept sorted best price first.
+
+    Levels are stored in parallel arrays so the best level is always at index 0.
+    Incoming exchange levels are diffed against the previous message by their raw
+    price key, so only levels that actually changed are parsed and moved.
+    """
+
+    __slots__ = ("prices", "volumes", "own_volumes", "_key", "_raw")
+
+    def __init__(self, descending: bool):
+        self.prices = array("d")
+        self.volumes = array("q")
+        self.own_volumes = array("q")
+        self._key = neg if descending else None
+        self._raw: dict[str, dict[str, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def _index(self, price: float) -> int:
+        if self._key is None:
+            return bisect_left(self.prices, price)
+        return bisect_left(self.prices, -price, key=self._key)
+
+    def set_level(self, price: float, volume: int, own_volume: int) -> None:
+        i = self._index(price)
+        if i < len(self.prices) and self.prices[i] == price:
+            self.volumes[i] = volume
+            self.own_volumes[i] = own_volume
+        else:
+            self.prices.insert(i, price)
+            self.volumes.insert(i, volume)
+            self.own_volumes.insert(i, own_volume)
+
+    def remove_level(self, price: float) -> None:
+        i = self._index(price)
+        if i < len(self.prices) and self.prices[i] == price:
+            del self.prices[i]
+            del self.volumes[i]
+            del self.own_volumes[i]
+
+    def apply(self, levels: dict[str, dict[str, int]]) -> int:
+        """
+        Replaces the side with `levels` (exchange format), touching only changed levels.
+        Returns the number of levels that were inserted, updated or removed.
+        """
+        previous = self._raw
+        removed = previous.keys() - levels.keys()
+        changed = [
+            price for price, volumes in levels.items() if previous.get(price) != volumes
+        ]
+        if len(removed) + len(changed) > len(levels) // 2:
+            # Most of the side changed, sorting once beats moving level by level
+            self._rebuild(levels)
+        else:
+            for price in removed:
+                self.remove_level(float(price))
+            for price in changed:
+                volumes = levels[price]
+                self.set_level(
+                    float(price), volumes["marketVolume"], volumes["userVolume"]
+                )
+        self._raw = levels
+        return len(removed) + len(changed)
+
+    def _rebuild(self, levels: dict[str, dict[str, int]]) -> None:
+        rows = sorted(
+            (
+                (float(price), volumes["marketVolume"], volumes["userVolume"])
+                for price, volumes in levels.items()
+            ),
+            reverse=self._key is not None,
+        )
+        self.prices = array("d", [row[0] for row in rows])
+        self.volumes = array("q", [row[1] for row in rows])
+        self.own_volumes = array("q", [row[2] for row in rows])
+
+    def load(self, levels: OrderLevels) -> None:
+        """
+        Replaces the side with already sorted levels, e.g. a REST snapshot
+        """
+        self.prices = array("d", levels.prices)
+        self.volumes = array("q", levels.volumes)
+        self.own_volumes = array("q", levels.own_volumes)
+        # The next stream message is diffed against nothing and rebuilds the side
+        self._raw = {}
+
+    def best(self) -> Order | None:
+        if not self.prices:
+            return None
+        return Order(self.prices[0], self.volumes[0], self.own_volumes[0])
+
+    def top(self, n: int | None = None) -> OrderLevels:
+        # Slicing an array is a single memcpy, no per-level objects are created
+        return OrderLevels(self.prices[:n], self.volumes[:n], self.own_volumes[:n])
+
+
+class LevelBook:
+    """
+    Incrementally maintained order book for a single product.
+
+    The SSE stream sends the full set of price levels on every "order" event. Rather
+    than re-sorting everything, each event is diffed against the previous one and
+    only the changed levels are updated in place.
+    """
+
+    __slots__ = ("product", "tick_size", "bids", "asks", "timestamp")
+
+    def __init__(self, product: str, tick_size: float):
+        self.product = product
+        self.tick_size = tick_size
+        self.timestamp: str | None = None
+        self.bids = _BookSide(descending=True)
+        self.asks = _BookSide(descending=False)
+
+    def update(self, orderbook: dict[str, Any]) -> int:
+        self.tick_size = orderbook["tickSize"]
+        self.timestamp = orderbook.get("timestamp")
+        return self.bids.apply(orderbook["buyOrders"]) + self.asks.apply(
+            orderbook["sellOrders"]
+        )
+
+    def load(self, orderbook: OrderBook) -> None:
+        """
+        Replaces the book with a full snapshot, e.g. from `BaseBot.request_orderbook`
+        """
+        self.tick_size = orderbook.tick_size
+        self.timestamp = orderbook.timestamp
+        self.bids.load(orderbook.buy_orders)
+        self.asks.load(orderbook.sell_orders)
+
+    @property
+    def best_bid(self) -> Order | None:
+        return self.bids.best()
+
+    @property
+    def best_ask(self) -> Order | None:
+        return self.asks.best()
+
+    def top(self, n: int) -> OrderBook:
+        """
+        Top `n` levels of each side, without rebuilding the rest of the book
+        """
+        return OrderBook(
+            self.product,
+            self.tick_size,
+            self.bids.top(n),
+            self.asks.top(n),
+            self.timestamp,
+        )
+
+    def snapshot(self, received_at: float | None = None) -> OrderBook:
+        return OrderBook(
+            self.product,
+            self.tick_size,
+            self.bids.top(),
+            self.asks.top(),
+            self.timestamp,
+            received_at,
+        )
+
+
+class PooledSession(requests.Session):
+    """
+    `requests.Session` with a sized keep-alive connection pool and default timeouts.
+
+    All REST calls of a bot go through one instance, so consecutive orders reuse an
+    already open TCP connection instead of doing a new handshake each time.
+    """
+
+    timeout: float | tuple[float, float]
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        timeout: float | tuple[float, float] = DEFAULT_TIMEOUT,
+    ):
+        super().__init__()
+        self.timeout = timeout
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.mount("http://", self._adapter)
+        self.mount("https://", self._adapter)
+
+    def request(self, method, url, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+    def connection_stats(self) -> dict[str, int]:
+        """
+        Number of requests sent and TCP connections opened by the pool so far.
+        `reused` counts requests that went out over an already open connection.
+        """
+        sent = opened = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                sent += pool.num_requests
+                opened += pool.num_connections
+        return {"requests": sent, "connections": opened, "reused": sent - opened}
+
+
+class ConflatingDispatcher:
+    """
+    Hands order books to a handler on worker threads, keeping only the newest
+    book per product.
+
+    The SSE reader never waits on the handler: if a product's previous book has
+    not been picked up yet it is replaced (and counted as conflated). A product is
+    never handled by two workers at once, so books of one product stay in order.
+
+    With a `latency` recorder the handler is timed on the worker (`on_orderbook`),
+    along with the time a book waited for it (`conflate_wait`), and orders it
+    sends are timed from when the book was read (`tick_to_order`).
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[OrderBook], Any],
+        workers: int = 1,
+        latency: "LatencyRecorder | None" = None,
+    ):
+        self._handler = handler
+        self.latency = latency
+        # Newest book of each product and the `perf_counter_ns` it was read at
+        self._latest: dict[str, tuple[OrderBook, int | None]] = {}
+        self._pending: deque[str] = deque()
+        self._busy: set[str] = set()
+        self._cond = Condition()
+        self._closed = False
+        self.received = 0
+        self.delivered = 0
+        self.conflated = 0
+        self._threads = [
+            Thread(target=self._work, name=f"ConflatingDispatcher-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join()
+
+    def submit(self, orderbook: OrderBook, received: int | None = None) -> None:
+        product = orderbook.product
+        with self._cond:
+            self.received += 1
+            if product in self._latest:
+                self.conflated += 1
+            elif product not in self._busy:
+                self._pending.append(product)
+                self._cond.notify()
+            self._latest[product] = (orderbook, received)
+
+    def stats(self) -> dict[str, int]:
+        with self._cond:
+            return {
+                "received": self.received,
+                "delivered": self.delivered,
+                "conflated": self.conflated,
+                "pending": len(self._pending),
+            }
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                product = self._pending.popleft()
+                orderbook, received = self._latest.pop(product)
+                self._busy.add(product)
+            latency = self.latency
+            try:
+                if latency is None:
+                    self._handler(orderbook)
+                else:
+                    start = perf_counter_ns()
+                    if received is not None:
+                        latency.record("conflate_wait", start - received)
+                    latency.set_origin(received)
+                    try:
+                        self._handler(orderbook)
+                    finally:
+                        latency.set_origin(None)
+                        latency.record("on_orderbook", perf_counter_ns() - start)
+            except Exception:
+                print(format_exc())
+            finally:
+                with self._cond:
+                    self._busy.discard(product)
+                    self.delivered += 1
+                    # A newer book arrived while we were busy with this product
+                    if product in self._latest:
+                        self._pending.append(product)
+                        self._cond.notify()
+
+
+@dataclass(frozen=True)
+class AccountSnapshot:
+    """
+    Immutable view of the account at one point in time
+    """
+
+    # Open orders by id, in the exchange's order format with `volume` left open
+    orders: Mapping[str, dict[str, Any]] = field(
+        default_factory=lambda: MappingProxyType({})
+    )
+    positions: Mapping[str, int] = field(default_factory=lambda: MappingProxyType({}))
+    version: int = 0
+    # Open volume and notional by (product, side), summed once per change
+    exposure: Mapping[tuple[str, str], tuple[int, float]] = field(
+        default_factory=lambda: MappingProxyType({})
+    )
+
+    def open_orders(self, product: str | None = None) -> list[dict[str, Any]]:
+        return [
+            order
+            for order in self.orders.values()
+            if product is None or order["product"] == product
+        ]
+
+    def position(self, product: str) -> int:
+        return self.positions.get(product, 0)
+
+    def open_exposure(self, product: str, side: str) -> tuple[int, float]:
+        """
+        Open volume and notional of the orders on one side of `product`
+        """
+        return self.exposure.get((product, side), (0, 0.0))
+
+
+class AccountMirror:
+    """
+    Local copy of the bot's open orders and net positions.
+
+    Seeded from REST, then kept up to date from order responses, cancels and own
+    trades on the market stream. Every change builds a new `AccountSnapshot` and
+    swaps it in, so readers take `snapshot` without any lock and always see a
+    consistent state. `reconcile` replaces the mirror with fresh REST state,
+    unless something changed locally while that state was being fetched; `drift`
+    counts reconciles that found the mirror out of date.
+
+    An order response already has its immediate fills taken off `volume`, and
+    the own trades of those fills may arrive before or after it. Per product
+    and side, the mirror keeps the fills the responses covered whose trades are
+    still to come, and the trades that matched no mirrored order yet, so each
+    fill is applied once either way.
+    """
+
+    def __init__(self, username: str):
+        self.username = username
+        self.snapshot = AccountSnapshot()
+        self.seeded = False
+        self.fills = 0
+        self.reconciled = 0
+        self.reconcile_skipped = 0
+        self.drift = 0
+        # Fill volume by (product, side) covered by order responses, not seen as
+        # trades yet, and own trade volume that matched no mirrored order
+        self._covered: dict[tuple[str, str], int] = {}
+        self._unmatched: dict[tuple[str, str], int] = {}
+        self._lock = Lock()
+
+    def seed(self, orders: list[dict[str, Any]], positions: dict[str, int]) -> None:
+        with self._lock:
+            self._swap(self._open(orders), dict(positions))
+            self._covered.clear()
+            self._unmatched.clear()
+            self.seeded = True
+
+    def reconcile(
+        self, orders: list[dict[str, Any]], positions: dict[str, int], version: int
+    ) -> bool:
+        """
+        Replaces the mirror with REST state fetched when it was at `version`.
+        Returns False, leaving the mirror as is, if it has changed since.
+        """
+        with self._lock:
+            current = self.snapshot
+            if current.version != version:
+                self.reconcile_skipped += 1
+                return False
+            orders = self._open(orders)
+            if self.seeded and (
+                orders.keys() != current.orders.keys()
+                or any(
+                    current.positions.get(product, 0) != position
+                    for product, position in positions.items()
+                )
+            ):
+                self.drift += 1
+            self._swap(orders, dict(positions))
+            self.reconciled += 1
+            self.seeded = True
+            return True
+
+    def on_order(self, order: Mapping[str, Any]) -> None:
+        filled = order.get("filled") or 0
+        if order["volume"] <= 0 and not filled:
+            return
+        with self._lock:
+            if filled:
+                key = (order["product"], order["side"])
+                # Trades of the immediate fills may have arrived already
+                seen = min(filled, self._unmatched.get(key, 0))
+                self._unmatched[key] = self._unmatched.get(key, 0) - seen
+                self._covered[key] = self._covered.get(key, 0) + filled - seen
+            if order["volume"] > 0:
+                orders = dict(self.snapshot.orders)
+                orders[order["id"]] = dict(order)
+                self._swap(orders)
+
+    def on_cancel(self, order_id: str) -> None:
+        with self._lock:
+            if order_id in self.snapshot.orders:
+                orders = dict(self.snapshot.orders)
+                del orders[order_id]
+                self._swap(orders)
+
+    def on_cancel_at(self, product: str, price: float) -> None:
+        with self._lock:
+            orders = {
+                order_id: order
+                for order_id, order in self.snapshot.orders.items()
+                if order["product"] != product or order["price"] != price
+            }
+            self._swap(orders)
+
+    def on_trades(self, trades: list[Mapping[str, Any]]) -> None:
+        """
+        Applies own trades; trades of other users are ignored
+        """
+        own = [
+            trade
+            for trade in trades
+            if self.username in (trade["buyer"], trade["seller"])
+        ]
+        if not own:
+            return
+        with self._lock:
+            orders = dict(self.snapshot.orders)
+            positions = dict(self.snapshot.positions)
+            for trade in own:
+                product = trade["product"]
+                for side, user in (
+                    (Side.BUY, trade["buyer"]),
+                    (Side.SELL, trade["seller"]),
+                ):
+                    if user != self.username:
+                        continue
+                    sign = 1 if side == Side.BUY else -1
+                    positions[product] = (
+                        positions.get(product, 0) + sign * trade["volume"]
+                    )
+                    self._fill(orders, product, side, trade["price"], trade["volume"])
+                self.fills += 1
+            self._swap(orders, positions)
+
+    def _fill(
+        self,
+        orders: dict[str, dict[str, Any]],
+        product: str,
+        side: Side,
+        price: float,
+        volume: int,
+    ) -> None:
+        key = (product, side)
+        covered = self._covered.get(key, 0)
+        if covered:
+            # Already taken off the volume of an order response
+            skipped = min(covered, volume)
+            self._covered[key] = covered - skipped
+            volume -= skipped
+            if not volume:
+                return
+        # Trades carry no order id; fill our orders that could have traded at
+        # `price`, best priced and then oldest first
+        candidates = sorted(
+            (
+                order
+                for order in orders.values()
+                if order["product"] == product
+                and order["side"] == side
+                and (
+                    order["price"] >= price
+                    if side == Side.BUY
+                    else order["price"] <= price
+                )
+            ),
+            key=lambda order: (
+                -order["price"] if side == Side.BUY else order["price"],
+                order["timestamp"],
+            ),
+        )
+        for order in candidates:
+            if volume <= 0:
+                break
+            filled = min(volume, order["volume"])
+            volume -= filled
+            if filled == order["volume"]:
+                del orders[order["id"]]
+            else:
+                orders[order["id"]] = {
+                    **order,
+                    "volume": order["volume"] - filled,
+                    "filled": order.get("filled", 0) + filled,
+                    "status": "PART_FILLED",
+                }
+        if volume > 0:
+            # The order's response may still be on its way
+            self._unmatched[key] = self._unmatched.get(key, 0) + volume
+
+    def _open(self, orders: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+        return {order["id"]: dict(order) for order in orders if order["volume"] > 0}
+
+    def _swap(
+        self,
+        orders: dict[str, dict[str, Any]],
+        positions: dict[str, int] | None = None,
+    ) -> None:
+        current = self.snapshot
+        exposure: dict[tuple[str, str], tuple[int, float]] = {}
+        for order in orders.values():
+            key = (order["product"], order["side"])
+            volume, notional = exposure.get(key, (0, 0.0))
+            exposure[key] = (
+                volume + order["volume"],
+                notional + order["volume"] * order["price"],
+            )
+        self.snapshot = AccountSnapshot(
+            MappingProxyType(orders),
+            current.positions if positions is None else MappingProxyType(positions),
+            current.version + 1,
+            MappingProxyType(exposure),
+        )
+
+
 class SSEThread(Thread):
+    """
+    Reads the market stream, reconnecting with jittered exponential backoff.
+
+    After a reconnect `handle_resync` is called with the length of the gap in
+    seconds before any new event is handled, so state that may have gone stale
+    while the stream was down can be fetched first.
+    """
+
     bearer: str
     url: str
     _handle_orderbook: Callable[[OrderBook], Any]
     _handle_trade_event: Callable[[Trade], Any]
     _http_stream: requests.Response | None = None
-    _client: sseclient.SSEClient | None = None
+    last_event_id: str | None = None
+    # Reconnection delay in ms, if the stream has sent one
+    retry: int | None = None
+    # First and largest delay in seconds between failed connection attempts
+    backoff: tuple[float, float] = (0.5, 30.0)
     _closed: bool = False
+    books: dict[str, "LevelBook"]
+    dispatcher: ConflatingDispatcher | None = None
+    journal: "EventJournal | None" = None
+    latency: "LatencyRecorder | None" = None
 
     def __init__(
         self,
@@ -157,79 +827,211 @@ class SSEThread(Thread):
         url: str,
         handle_orderbook: Callable[[OrderBook], Any],
         handle_trade_event: Callable[[Trade], Any],
+        session: requests.Session | None = None,
+        conflate_workers: int = 0,
+        handle_resync: Callable[[float], Any] | None = None,
+        journal: "EventJournal | None" = None,
+        latency: "LatencyRecorder | None" = None,
+        decoder: Decoder = DEFAULT_DECODER,
     ):
         super().__init__()
 
         self.bearer = bearer
         self.url = url
+        self._session = session or requests.Session()
         self._handle_orderbook = handle_orderbook
         self._handle_trade_event = handle_trade_event
+        self._handle_resync = handle_resync
+        # Raw events are recorded before they are handled
+        self.journal = journal
+        self.latency = latency
+        self._decode = decoder
+        self.books = {}
+        self.connections = 0
+        self.disconnects = 0
+        # Seconds without a stream, from losing it until resynced on a new one
+        self.last_gap = 0.0
+        self.max_gap = 0.0
+        self._disconnected_at: float | None = None
+        self._closing = Event()
+        if conflate_workers:
+            self.dispatcher = ConflatingDispatcher(
+                handle_orderbook, conflate_workers, latency
+            )
+            self._handle_orderbook = self.dispatcher.submit
+
+    def start(self):
+        if self.dispatcher:
+            self.dispatcher.start()
+        super().start()
 
     def run(self):
+        # Failed attempts since the stream was last up
+        attempts = 0
         while not self._closed:
+            connections = self.connections
             try:
                 self._start_sse_client()
-            except Exception:
-                if not self._closed:
-                    print("Encountered an error. Trying to restart SSE client...")
-                    print(format_exc())
+                error = None
+            except Exception as exc:
+                error, trace = exc, format_exc()
+            if self._closed:
+                break
+            if self._disconnected_at is None:
+                self._disconnected_at = perf_counter()
+            if self.connections > connections:
+                attempts = 0
+            self.disconnects += 1
+            delay = self._backoff(attempts)
+            attempts += 1
+            if attempts == 1 and error is not None:
+                # Only the first failure of an outage is printed in full
+                print("Market stream failed:")
+                print(trace)
+            print(
+                f"Market stream {'lost' if error is None else f'down ({error!r})'}, "
+                f"reconnecting in {delay:.2f}s (attempt {attempts})"
+            )
+            self._closing.wait(delay)
+
+    def _backoff(self, attempts: int) -> float:
+        """
+        Seconds to wait before the next attempt, the server's `retry` or the first
+        backoff doubled per failed attempt, up to the largest, half of it random
+        so that clients do not reconnect in lockstep
+        """
+        first, largest = self.backoff
+        if self.retry is not None:
+            first = self.retry / 1000
+        # The exponent is capped, 2**1024 would overflow a float
+        delay = min(first * 2 ** min(attempts, 32), largest)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    @property
+    def reconnects(self) -> int:
+        return max(self.connections - 1, 0)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "connections": self.connections,
+            "reconnects": self.reconnects,
+            "disconnects": self.disconnects,
+            "last_gap": self.last_gap,
+            "max_gap": self.max_gap,
+        }
+
+    def load_books(self, orderbooks: Iterable[OrderBook]) -> None:
+        """
+        Replaces the local books of these products with full snapshots
+        """
+        for orderbook in orderbooks:
+            book = self.books.get(orderbook.product)
+            if book is None:
+                book = self.books[orderbook.product] = LevelBook(
+                    orderbook.product, orderbook.tick_size
+                )
+            book.load(orderbook)
 
     def close(self):
         self._closed = True
+        self._closing.set()
         if self._http_stream:
             self._http_stream.close()
-        if self._client:
-            self._client.close()
-
-    def _handle_orderbook_change(self, orderbook: dict[str, Any]):
-        buy_orders = sorted(
-            [
-                {
-                    "price": float(price),
-                    "volume": volumes["marketVolume"],
-                    "own_volume": volumes["userVolume"],
-                }
-                for price, volumes in orderbook["buyOrders"].items()
-            ],
-            key=lambda d: -d["price"],
-        )
-        sell_orders = sorted(
-            [
-                {
-                    "price": float(price),
-                    "volume": volumes["marketVolume"],
-                    "own_volume": volumes["userVolume"],
-                }
-                for price, volumes in orderbook["sellOrders"].items()
-            ],
-            key=lambda d: d["price"],
-        )
+        if self.dispatcher:
+            self.dispatcher.close()
 
-        self._handle_orderbook(
-            OrderBook(
-                orderbook["productsymbol"],
-                orderbook["tickSize"],
-                list(map(lambda order: Order(**order), buy_orders)),
-                list(map(lambda order: Order(**order), sell_orders)),
-            )
-        )
+    def _handle_orderbook_change(
+        self,
+        orderbook: dict[str, Any],
+        received_at: float | None = None,
+        received: int | None = None,
+    ):
+        product = orderbook["productsymbol"]
+        book = self.books.get(product)
+        if book is None:
+            book = self.books[product] = LevelBook(product, orderbook["tickSize"])
+        latency = self.latency
+        if latency is None:
+            book.update(orderbook)
+            self._handle_orderbook(book.snapshot(received_at))
+            return
+
+        start = perf_counter_ns()
+        book.update(orderbook)
+        snapshot = book.snapshot(received_at)
+        built = perf_counter_ns()
+        latency.record("book_build", built - start)
+        if self.dispatcher is not None:
+            # Handled and timed on the dispatcher's workers
+            self.dispatcher.submit(snapshot, received)
+            return
+        # Orders sent by the handler are timed from reading this event
+        latency.set_origin(received)
+        try:
+            self._handle_orderbook(snapshot)
+        finally:
+            latency.set_origin(None)
+        latency.record("on_orderbook", perf_counter_ns() - built)
 
     def _start_sse_client(self):
         headers = {
             "Authorization": self.bearer,
             "Accept": "text/event-stream; charset=utf-8",
         }
+        if self.last_event_id is not None:
+            # Lets the exchange resume the stream where we lost it
+            headers["Last-Event-ID"] = self.last_event_id
 
-        self._http_stream = requests.get(
-            self.url, stream=True, headers=headers, timeout=30
+        self._http_stream = self._session.get(
+            self.url, stream=True, headers=headers, timeout=(DEFAULT_TIMEOUT[0], 30)
         )
-        self._client = sseclient.SSEClient(self._http_stream)
-
-        for event in self._client.events():
-            if event.event == "order":
-                self._handle_orderbook_change(json.loads(event.data))
-            elif event.event == "trade":
-                self._handle_trade_event(json.loads(event.data))
+        self._http_stream.raise_for_status()
+        # Reading the raw stream bypasses requests, which would otherwise decompress
+        self._http_stream.raw.decode_content = True
+        parser = SSEParser(self.last_event_id)
+
+        if self._disconnected_at is not None:
+            # Book changes and fills may have been missed while the stream was down,
+            # new events wait in the socket until the resync is done
+            if self._handle_resync:
+                self._handle_resync(perf_counter() - self._disconnected_at)
+            self.last_gap = perf_counter() - self._disconnected_at
+            self.max_gap = max(self.max_gap, self.last_gap)
+            self._disconnected_at = None
+            if self.latency is not None:
+                self.latency.record("reconnect_gap", int(self.last_gap * 1e9))
+        # Only counted once resynced, a resync that keeps failing backs off further
+        self.connections += 1
+
+        latency, decode = self.latency, self._decode
+        for chunk in read_chunks(self._http_stream.raw):
+            events = parser.feed(chunk)
+            self.last_event_id, self.retry = parser.last_event_id, parser.retry
+            for event in events:
+                received = None
+                if latency is not None:
+                    received = perf_counter_ns()
+                    latency.count(f"sse_{event.event}")
+                if event.event == "order":
+                    received_at = time()
+                    orderbook = decode(event.data)
+                    if latency is not None:
+                        latency.record("json_decode", perf_counter_ns() - received)
+                    if self.journal:
+                        self.journal.record("order", orderbook, received_at)
+                    self._handle_orderbook_change(orderbook, received_at, received)
+                elif event.event == "trade":
+                    trades = decode(event.data)
+                    if latency is not None:
+                        latency.record("json_decode", perf_counter_ns() - received)
+                    if self.journal:
+                        self.journal.record("trade", trades)
+                    if latency is None:
+                        self._handle_trade_event(trades)
+                    else:
+                        start = perf_counter_ns()
+                        self._handle_trade_event(trades)
+                        latency.record("on_trades", perf_counter_ns() - start)
 
 
 class BaseBot(ABC):
@@ -237,48 +1039,124 @@ class BaseBot(ABC):
     _password: str
     _cmi_url: str
     _sse_thread: SSEThread = None
+    _session: PooledSession
+    _executor: ThreadPoolExecutor
+    _reconciler: Thread | None = None
+    batch_latencies: list[float]
+    account: AccountMirror
 
-    def __init__(self, cmi_url: str, username: str, password: str):
+    def __init__(
+        self,
+        cmi_url: str,
+        username: str,
+        password: str,
+        pool_size: int = 10,
+        timeout: float | tuple[float, float] = DEFAULT_TIMEOUT,
+        max_workers: int | None = None,
+        reconcile_interval: float | None = 30.0,
+        latency: "LatencyRecorder | None" = None,
+        decoder: Decoder | str | None = None,
+        risk: "RiskGate | None" = None,
+    ):
         self._cmi_url = cmi_url
         self.username = username
         self._password = password
+        self._session = PooledSession(pool_size=pool_size, timeout=timeout)
+        # More workers than pooled connections would only queue on the pool
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or pool_size, thread_name_prefix="BaseBot"
+        )
+        self.batch_latencies = []
+        self.account = AccountMirror(username)
+        self.reconcile_interval = reconcile_interval
+        self._stopped = Event()
+        # Stage timings of the SSE-to-order path, see `latency.LatencyRecorder`
+        self.latency = latency
+        # JSON decoder of market events and REST responses, e.g. "json" or "orjson"
+        self._decode = json_decoder(decoder)
+        # Pre-trade limits every order has to pass, see `risk.RiskGate`
+        self.risk = risk
 
     @cached_property
     def auth_token(self):
         return self._authenticate()
 
     def start(
-        self, on_orderbook: Callable | None = None, on_trades: Callable | None = None
+        self,
+        on_orderbook: Callable | None = None,
+        on_trades: Callable | None = None,
+        conflate_workers: int = 0,
+        journal: "EventJournal | None" = None,
     ) -> None:
         """
-        Creates SSE thread to handle market events
+        Creates SSE thread to handle market events.
+
+        With `conflate_workers` > 0, order books are handled on that many worker
+        threads and a slow handler only ever sees the newest book of a product.
+        A `journal` records every raw market event, e.g. for `backtest.py`.
+
+        Open orders and positions are seeded into `account` first and then kept up
+        to date from own trades, with a REST reconcile every `reconcile_interval`.
         """
         if self._sse_thread:
             raise Exception(
                 "Bot already running. Please use the `stop()` method before trying again."
             )
+        on_trades = on_trades or self.on_trades
+
+        def handle_trades(trades):
+            self.account.on_trades(trades)
+            on_trades(trades)
+
+        self.reconcile_account()
 
         self._sse_thread = SSEThread(
             bearer=self.auth_token,
             url=f"{self._cmi_url}/api/market/stream",
             handle_orderbook=on_orderbook or self.on_orderbook,
-            handle_trade_event=on_trades or self.on_trades,
+            handle_trade_event=handle_trades,
+            session=self._session,
+            conflate_workers=conflate_workers,
+            handle_resync=self.resync,
+            journal=journal,
+            latency=self.latency,
+            decoder=self._decode,
         )
 
         print("Starting SSEThread...")
         self._sse_thread.start()
         print("SSEThread started.")
 
+        if self.reconcile_interval:
+            self._stopped.clear()
+            self._reconciler = Thread(
+                target=self._reconcile_loop, name="BaseBot-reconcile", daemon=True
+            )
+            self._reconciler.start()
+
     def stop(self) -> None:
         """
         Closes SSE thread
         """
+        self._stopped.set()
+        if self._reconciler:
+            self._reconciler.join()
+            self._reconciler = None
         print("Closing SSE Thread...")
         self._sse_thread.close()
         self._sse_thread.join()
         self._sse_thread = None
         print("SSE Thread closed")
 
+    def close(self) -> None:
+        """
+        Stops the bot and releases its worker threads and HTTP connections
+        """
+        if self._sse_thread:
+            self.stop()
+        self._executor.shutdown(wait=True)
+        self._session.close()
+
     @abstractmethod
     def on_orderbook(self, orderbook: OrderBook):
         raise NotImplementedError("You must implement the on_orderbook method!")
@@ -287,96 +1165,270 @@ class BaseBot(ABC):
     def on_trades(self, trades: list[Trade]):
         raise NotImplementedError("You must implement the on_trades method!")
 
+    def on_resynced(self, orderbooks: dict[str, OrderBook], gap: float):
+        """
+        Called when the market stream is back after a disconnect of `gap` seconds,
+        once `orderbooks` and `account` have been refreshed and before new events
+        """
+
+    def resync(self, gap: float = 0.0) -> None:
+        """
+        Fetches the current books of all products and the account in parallel,
+        replaces the local books with them and calls `on_resynced`
+        """
+        thread = self._sse_thread
+        products = list(thread.books) if thread else []
+        if not products:
+            products = [product.symbol for product in self.request_all_products() or []]
+        # Books go out on the worker pool next to the two account requests
+        pending = [
+            self._executor.submit(self.request_orderbook, product)
+            for product in products
+        ]
+        try:
+            self.reconcile_account()
+        except Exception:
+            print("Failed to reconcile account:")
+            print(format_exc())
+        orderbooks = {}
+        for future in pending:
+            orderbook = future.result()
+            if orderbook is not None:
+                orderbooks[orderbook.product] = orderbook
+        if thread:
+            thread.load_books(orderbooks.values())
+        self.on_resynced(orderbooks, gap)
+
+    def reconcile_account(self) -> bool:
+        """
+        Refreshes `account` from the REST API, see `AccountMirror.reconcile`
+        """
+        version = self.account.snapshot.version
+        orders = self._executor.submit(self.request_all_orders)
+        positions = self._executor.submit(self.request_net_positions)
+        orders, positions = orders.result(), positions.result()
+        if orders is None or positions is None:
+            return False
+        return self.account.reconcile(orders, positions, version)
+
+    def _reconcile_loop(self) -> None:
+        while not self._stopped.wait(self.reconcile_interval):
+            try:
+                self.reconcile_account()
+            except Exception:
+                print("Failed to reconcile account:")
+                print(format_exc())
+
+    def stream_stats(self) -> dict[str, float] | None:
+        """
+        Connections, reconnects, disconnects and gaps in seconds of the market stream
+        """
+        if self._sse_thread:
+            return self._sse_thread.stats()
+
+    def connection_stats(self) -> dict[str, int]:
+        """
+        Connection reuse statistics of the bot's HTTP pool
+        """
+        return self._session.connection_stats()
+
+    def conflation_stats(self) -> dict[str, int] | None:
+        """
+        Received, delivered and conflated book counts when running with conflation
+        """
+        if self._sse_thread and self._sse_thread.dispatcher:
+            return self._sse_thread.dispatcher.stats()
+
     def _get_headers(self) -> dict[str, str]:
         return {**STANDARD_HEADERS, "Authorization": self.auth_token}
 
+    def _request(self, stage: str, method: str, url: str, **kwargs):
+        latency = self.latency
+        if latency is None:
+            return self._session.request(method, url, **kwargs)
+        start = perf_counter_ns()
+        try:
+            return self._session.request(method, url, **kwargs)
+        finally:
+            latency.record(stage, perf_counter_ns() - start)
+
     def send_order(self, order_request: OrderRequest) -> OrderResponse | None:
+        """
+        Sends an order, unless the bot's `risk` gate rejects it (returning None)
+        """
+        if self.latency is not None:
+            self.latency.record_since_origin("tick_to_order", perf_counter_ns())
+        risk = self.risk
+        if risk is None:
+            order = self._post_order(order_request)
+            if order is None:
+                return None
+            self.account.on_order(order)
+            return OrderResponse(**order)
+
+        if not risk.admit(order_request, self.account):
+            return None
+        order = None
+        try:
+            order = self._post_order(order_request)
+        finally:
+            # The reservation turns into an open order in `account` in one step, so
+            # no concurrent check sees it twice or not at all
+            risk.release(
+                order_request,
+                None if order is None else lambda: self.account.on_order(order),
+            )
+        return None if order is None else OrderResponse(**order)
+
+    def _post_order(self, order_request: OrderRequest) -> dict[str, Any] | None:
         payload = asdict(order_request)
         url = f"{self._cmi_url}/api/order"
-        response = requests.post(url, json=payload, headers=self._get_headers())
+        response = self._request(
+            "http_send_order", "POST", url, json=payload, headers=self._get_headers()
+        )
         if response.status_code == 200:
-            return OrderResponse(**response.json())
-        else:
-            print(
-                f"Failed to send order, {order_request}, with response {response.content}"
-            )
+            return self._decode(response.content)
+        if self.latency is not None:
+            self.latency.count("send_order_failed")
+        print(
+            f"Failed to send order, {order_request}, with response {response.content}"
+        )
 
-    def send_mass_orders(
-        self, order_requests: list[OrderRequest]
-    ) -> list[OrderResponse]:
-        responses = []
+    def _run_batch(self, fn: Callable[[Any], Any], items: list) -> list:
+        """
+        Runs `fn` over `items` on the bot's worker pool.
+        Results are returned in the order of `items`; the latency of every call is
+        stored in `batch_latencies`, also in request order.
+        """
 
-        def worker(order_request, response_list):
-            response = self.send_order(order_request)
-            response_list.append(response)
+        def timed(item):
+            start = perf_counter()
+            result = fn(item)
+            return result, perf_counter() - start
 
-        threads = []
-        for order_request in order_requests:
-            thread = Thread(target=worker, args=(order_request, responses))
-            threads.append(thread)
-            thread.start()
+        results = list(self._executor.map(timed, items))
+        self.batch_latencies = [latency for _, latency in results]
+        return [result for result, _ in results]
 
-        for thread in threads:
-            thread.join()
+    def run_parallel(self, fn: Callable[[Any], Any], items: Iterable) -> list:
+        """
+        Runs `fn` over `items` on the bot's worker pool, results in the order of
+        `items`. Unlike the mass order methods it leaves `batch_latencies` alone.
+        """
+        return list(self._executor.map(fn, items))
 
-        return responses
+    def send_mass_orders(
+        self, order_requests: list[OrderRequest]
+    ) -> list[OrderResponse | None]:
+        return self._run_batch(self.send_order, order_requests)
 
     def request_all_orders(self) -> list[dict] | None:
         url = f"{self._cmi_url}/api/order/current-user"
-        response = requests.get(url, headers=self._get_headers())
+        response = self._session.get(url, headers=self._get_headers())
         if response.status_code == 200:
-            return response.json()
+            return self._decode(response.content)
         else:
             print(f"Failed to get all orders: {response.content}")
 
     def cancel_order_by_id(self, order_id: str) -> dict | None:
         url = f"{self._cmi_url}/api/order/{order_id}"
-        response = requests.delete(url, headers=self._get_headers())
+        response = self._request(
+            "http_cancel_order", "DELETE", url, headers=self._get_headers()
+        )
         if response.status_code == 200:
-            return response.json()
+            self.account.on_cancel(order_id)
+            return self._decode(response.content)
 
         print(f"Failed to cancel order: {response.content}")
 
     def cancel_order(self, product: str, price: float) -> dict | None:
         url = f"{self._cmi_url}/api/order?product={product}&price={price}"
-        response = requests.delete(url, headers=self._get_headers())
+        response = self._request(
+            "http_cancel_order", "DELETE", url, headers=self._get_headers()
+        )
         if response.status_code == 200:
-            return response.json()
+            self.account.on_cancel_at(product, price)
+            return self._decode(response.content)
         else:
             print(f"Failed to cancel order: {response.content}")
 
+    def cancel_mass_orders(self, order_ids: list[str]) -> list[dict | None]:
+        return self._run_batch(self.cancel_order_by_id, order_ids)
+
     def cancel_all_orders(self) -> None:
-        for order in self.request_all_orders():
-            url = f"{self._cmi_url}/api/order/{order['id']}"
-            response = requests.delete(url, headers=self._get_headers())
-            if response.status_code != 200:
-                print(f"Failed to cancel order: {response.content}")
+        if self.account.seeded:
+            orders = self.account.snapshot.open_orders()
+        else:
+            orders = self.request_all_orders() or []
+        self.cancel_mass_orders([order["id"] for order in orders])
+
+    @staticmethod
+    def _rest_levels(levels: list[dict]) -> OrderLevels:
+        return OrderLevels(
+            [level["price"] for level in levels],
+            [level.get("volume", 0) for level in levels],
+            [level.get("userVolume", 0) for level in levels],
+        )
+
+    def request_orderbook(self, product: str) -> OrderBook | None:
+        """
+        Current order book snapshot of `product` from the REST API
+        """
+        url = f"{self._cmi_url}/api/product/{product}/order-book/current-user"
+        response = self._request(
+            "http_orderbook", "GET", url, headers=self._get_headers()
+        )
+        if response.status_code == 200:
+            orderbook = self._decode(response.content)
+            return OrderBook(
+                product,
+                orderbook.get("tickSize", 0.0),
+                self._rest_levels(orderbook["buy"]),
+                self._rest_levels(orderbook["sell"]),
+                received_at=time(),
+            )
+        else:
+            print(f"Failed to get order book for {product}: {response.content}")
 
     def request_all_products(self) -> list[Product] | None:
         url = f"{self._cmi_url}/api/product"
-        response = requests.get(url, headers=self._get_headers())
+        response = self._session.get(url, headers=self._get_headers())
         if response.status_code == 200:
-            return list(map(lambda prod: Product(**prod), json.loads(response.text)))
+            return list(
+                map(lambda prod: Product(**prod), self._decode(response.content))
+            )
         else:
             print(f"Failed to get all products: {response.content}")
 
+    def request_trades(self) -> list[dict] | None:
+        """
+        Trade history of the exchange, in the format of the SSE "trade" events
+        """
+        url = f"{self._cmi_url}/api/trade"
+        response = self._session.get(url, headers=self._get_headers())
+        if response.status_code == 200:
+            return self._decode(response.content)
+        else:
+            print(f"Failed to get trades: {response.content}")
+
     def request_positions(self) -> dict[str, int] | None:
         url = f"{self._cmi_url}/api/position/current-user"
-        response = requests.get(url, headers=self._get_headers())
+        response = self._session.get(url, headers=self._get_headers())
         if response.status_code == 200:
             return {
-                position["product"]: position["volume"] for position in response.json()
+                position["product"]: position["volume"]
+                for position in self._decode(response.content)
             }
         else:
             print(f"Failed to get positions: {response.content}")
 
     def request_net_positions(self) -> dict[str, int] | None:
         url = f"{self._cmi_url}/api/position/current-user"
-        response = requests.get(url, headers=self._get_headers())
+        response = self._session.get(url, headers=self._get_headers())
         if response.status_code == 200:
             return {
                 position["product"]: position["netPosition"]
-                for position in response.json()
+                for position in self._decode(response.content)
             }
         else:
             print(f"Failed to get net positions for user: {response.content}")
@@ -384,7 +1436,7 @@ class BaseBot(ABC):
     def _authenticate(self) -> str:
         auth = {"username": self.username, "password": self._password}
         url = f"{self._cmi_url}/api/user/authenticate"
-        response = requests.post(url, headers=STANDARD_HEADERS, json=auth)
+        response = self._session.post(url, headers=STANDARD_HEADERS, json=auth)
         response.raise_for_status()
 
         return response.headers["Authorization"]
@@ -0,0 +1,168 @@
+import json
+import time
+from array import array
+from threading import Lock, local
+from typing import Any
+
+# Values below 2**PRECISION_BITS ns get their own bucket, larger values are
+# bucketed with a relative error below 2**-(PRECISION_BITS - 1), about 1.6%
+PRECISION_BITS = 7
+_HALF = 1 << (PRECISION_BITS - 1)
+# Enough buckets for values up to 2**40 ns (about 18 minutes)
+_BUCKETS = (40 - PRECISION_BITS + 2) * _HALF
+
+
+def _bucket_value(index: int) -> int:
+    # Lowest value falling into bucket `index`
+    if index < 2 * _HALF:
+        return index
+    shift = index // _HALF - 1
+    return (index - shift * _HALF) << shift
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of nanosecond latencies with log-linear buckets.
+
+    Recording is a bucket computation and an increment, memory is a fixed array
+    of counts regardless of how many values are recorded.
+    """
+
+    def __init__(self):
+        self.counts = array("q", bytes(8 * _BUCKETS))
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+        self._lock = Lock()
+
+    def record(self, value: int) -> None:
+        # Bucket `value` keeping its top PRECISION_BITS bits, inverse of `_bucket_value`
+        if value < 2 * _HALF:
+            index = value if value > 0 else 0
+        else:
+            shift = value.bit_length() - PRECISION_BITS
+            index = (shift * _HALF) + (value >> shift)
+            if index >= _BUCKETS:
+                index = _BUCKETS - 1
+        with self._lock:
+            self.counts[index] += 1
+            if value > self.max:
+                self.max = value
+            if value < self.min or not self.count:
+                self.min = value
+            self.count += 1
+            self.total += value
+
+    def percentile(self, q: float) -> int:
+        """
+        Latency in ns below which `q` percent of the values fall
+        """
+        if not self.count:
+            return 0
+        rank = max(1, round(q / 100 * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(max(_bucket_value(index), self.min), self.max)
+        return self.max
+
+    def snapshot(self) -> dict[str, float]:
+        """
+        Summary in microseconds
+        """
+        with self._lock:
+            return {
+                "count": self.count,
+                "min": self.min / 1e3,
+                "mean": self.total / self.count / 1e3 if self.count else 0.0,
+                "p50": self.percentile(50) / 1e3,
+                "p90": self.percentile(90) / 1e3,
+                "p99": self.percentile(99) / 1e3,
+                "p99.9": self.percentile(99.9) / 1e3,
+                "max": self.max / 1e3,
+            }
+
+
+class LatencyRecorder:
+    """
+    Per-stage latency histograms and counters for the SSE-to-order path.
+
+    `BaseBot(latency=LatencyRecorder())` records:
+    - json_decode: parsing an SSE event's data
+    - book_build: applying a book event and taking the `OrderBook` snapshot
+    - on_orderbook: the order book handler, from entry to exit
+    - conflate_wait: with conflation, from reading a book to a worker taking it
+    - on_trades: the trade handler, from entry to exit
+    - tick_to_order: from reading a book event to sending an order in its
+      handler; orders sent from other handlers are not timed
+    - http_<method>: REST round trips of orders, cancels and book requests
+
+    Without a recorder (the default) every callsite is skipped by a single
+    `is None` check.
+    """
+
+    def __init__(self):
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.counters: dict[str, int] = {}
+        self._lock = Lock()
+        self._origin = local()
+
+    def histogram(self, stage: str) -> LatencyHistogram:
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, LatencyHistogram())
+        return histogram
+
+    def record(self, stage: str, nanoseconds: int) -> None:
+        self.histogram(stage).record(nanoseconds)
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set_origin(self, nanoseconds: int | None) -> None:
+        """
+        Marks the event currently handled on this thread, see `record_since_origin`.
+        Handlers clear it with None when they return.
+        """
+        self._origin.value = nanoseconds
+
+    def record_since_origin(self, stage: str, nanoseconds: int) -> None:
+        origin = getattr(self._origin, "value", None)
+        if origin is not None:
+            self.record(stage, nanoseconds - origin)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+        return {
+            "stages": {
+                stage: histogram.snapshot() for stage, histogram in histograms.items()
+            },
+            "counters": counters,
+        }
+
+    def export(self, path: str) -> None:
+        """
+        Appends the current snapshot with a timestamp as one JSON line to `path`
+        """
+        with open(path, "a") as file:
+            file.write(json.dumps({"t": time.time(), **self.snapshot()}) + "\n")
+
+    def report(self) -> str:
+        snapshot = self.snapshot()
+        lines = [
+            f"{'stage':<16}{'count':>10}{'p50':>10}{'p99':>10}{'p99.9':>10}{'max':>10} (us)"
+        ]
+        for stage, stats in sorted(snapshot["stages"].items()):
+            lines.append(
+                f"{stage:<16}{stats['count']:>10}{stats['p50']:>10.1f}"
+                f"{stats['p99']:>10.1f}{stats['p99.9']:>10.1f}{stats['max']:>10.1f}"
+            )
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"{name:<16}{value:>10}")
+        return "\n".join(lines)
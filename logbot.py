@@ -1,9 +1,17 @@
-from imcity_template import BaseBot, Side, OrderRequest, OrderBook, Order
+from imcity_template import (
+    BaseBot,
+    Side,
+    OrderRequest,
+    OrderBook,
+    Order,
+    parse_timestamp,
+)
+from rolling import BreakoutTracker
+from tickstore import EventJournal, TickRecorder, TickStore
 
+import math
 import time
-import pandas as pd
-import requests
-import json
+from threading import Lock
 
 TEST_EXCHANGE = "http://ec2-52-31-108-187.eu-west-1.compute.amazonaws.com"  # TODO
 REAL_EXCHANGE = "http://ec2-18-203-201-148.eu-west-1.compute.amazonaws.com"  # TODO
@@ -13,6 +21,66 @@ username = (
 )
 password = "something simple"  # TODO: Change this to be your team's password you've created in CMI
 
+WINDOWS = (60, 300)
+
+recorder = TickRecorder()
+# Full books and trades for `backtest.py`
+journal = EventJournal()
+tracker = BreakoutTracker(windows=WINDOWS, threshold=1.05)
+# Guards the tracker and recorder should books be handled on several threads
+tick_lock = Lock()
+
+
+def on_tick(
+    product: str,
+    buy_price: float,
+    sell_price: float,
+    buy_volume: int = 0,
+    sell_volume: int = 0,
+    current_time: float | None = None,
+    exchange_time: float = math.nan,
+):
+    current_time = time.time() if current_time is None else current_time
+    if product not in tracker:
+        # Warm up from the ticks recorded in a previous session
+        for t, bid, ask in (
+            TickStore(recorder.path(product))
+            .last(max(WINDOWS), current_time)[["t", "bid", "ask"]]
+            .tolist()
+        ):
+            tracker.update(product, t, bid, ask)
+    signal = tracker.check(product, current_time, buy_price, sell_price, window=300)
+    if signal == "sell":
+        print(f"SELL {product}")
+    elif signal == "buy":
+        print(f"BUY {product}")
+    tracker.update(product, current_time, buy_price, sell_price)
+    recorder.record(
+        product,
+        buy_price,
+        sell_price,
+        buy_volume,
+        sell_volume,
+        t=current_time,
+        exchange_t=exchange_time,
+    )
+
+
+def record_book(orderbook: OrderBook):
+    buy, sell = orderbook.buy_orders, orderbook.sell_orders
+    if not buy or not sell:
+        return
+    with tick_lock:
+        on_tick(
+            orderbook.product,
+            buy.prices[0],
+            sell.prices[0],
+            buy.volumes[0],
+            sell.volumes[0],
+            orderbook.received_at,
+            (parse_timestamp(orderbook.timestamp) if orderbook.timestamp else math.nan),
+        )
+
 
 class CustomBot(BaseBot):
 
@@ -21,62 +89,27 @@ class CustomBot(BaseBot):
         for trade in trades:
             print(f"{trade['volume']} @ {trade['price']}")
 
-    # Handler for order book updates
+    # Handler for order book updates, records every change of every product
     def on_orderbook(self, orderbook: OrderBook):
-        current_time = time.time()
-        file = orderbook.product
-        df = pd.read_csv(file, header=None)
-        print(df)
-        time.sleep(0.3)
-        # df = df[df[0] >= current_time - 300]
-        if orderbook.buy_orders[0] > df[2].max() * 1.05:
-            print(f"SELL {file}")
-        elif orderbook.sell_orders[0] < df[1].min() / 1.05:
-            print(f"BUY {file}")
-        with open(f"{file}", "a") as myfile:
-            myfile.write(
-                f"{current_time}, {orderbook.buy_orders[0].price}, {orderbook.sell_orders[0].price}\n"
-            )
-            myfile.flush()
-
-
-def main(product, buy_price, sell_price):
-    current_time = time.time()
-    file = product
-    df = pd.read_csv(file, header=None)
-    df = df[df[0] >= current_time - 300]
-    if buy_price > df[2].max() * 1.05:
-        print(f"SELL {file}")
-    elif sell_price < df[1].min() / 1.05:
-        print(f"BUY {file}")
-    with open(f"{file}", "a") as myfile:
-        myfile.write(f"{current_time}, {buy_price}, {sell_price}\n")
-        myfile.flush()
-
-
-bot = CustomBot(REAL_EXCHANGE, username, password)
-
-try:
-    while True:
-        time.sleep(8)
-        for market in [
-            "1_Eisbach",
-            "2_Eisbach_Call",
-            "3_Weather",
-            "7_ETF",
-            "8_ETF_Strangle",
-            "5_Flights",
-            "4_Weather",
-            "6_Airport",
-        ]:
-            response = requests.get(
-                f"{REAL_EXCHANGE}/api/product/{market}/order-book/current-user?sessionId=CRAB",
-                headers=bot._get_headers(),
-            )
-            main(
-                market,
-                json.loads(response.text)["buy"][0]["price"],
-                json.loads(response.text)["sell"][0]["price"],
-            )
-except KeyboardInterrupt:
-    pass
+        record_book(orderbook)
+
+    # Changes missed while disconnected are covered by one snapshot per market
+    def on_resynced(self, orderbooks: dict[str, OrderBook], gap: float):
+        print(f"Market stream back after {gap:.1f}s")
+        for orderbook in orderbooks.values():
+            record_book(orderbook)
+
+
+if __name__ == "__main__":
+    bot = CustomBot(REAL_EXCHANGE, username, password)
+
+    try:
+        bot.start(journal=journal)
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bot.close()
+        recorder.close()
+        journal.close()
@@ -0,0 +1,192 @@
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from threading import Lock
+
+import numpy as np
+
+import utils
+
+
+@dataclass(frozen=True)
+class RandomWalk:
+    """
+    Path starting at `start` with normally distributed steps, clipped to bounds
+    """
+
+    start: float
+    volatility: float
+    intervals: int
+    drift: float = 0.0
+    lower: float = -np.inf
+    upper: float = np.inf
+
+    def sample(self, rng: np.random.Generator, scenarios: int) -> np.ndarray:
+        steps = rng.normal(self.drift, self.volatility, (scenarios, self.intervals))
+        return np.clip(self.start + np.cumsum(steps, axis=1), self.lower, self.upper)
+
+
+@dataclass(frozen=True)
+class ForecastPath:
+    """
+    Forecast values per interval plus a random walk error growing with the horizon
+    """
+
+    forecast: tuple[float, ...]
+    volatility: float
+    lower: float = -np.inf
+    upper: float = np.inf
+
+    @classmethod
+    def from_values(cls, values, volatility: float, **bounds) -> "ForecastPath":
+        return cls(tuple(float(value) for value in values), volatility, **bounds)
+
+    def sample(self, rng: np.random.Generator, scenarios: int) -> np.ndarray:
+        errors = np.cumsum(
+            rng.normal(0.0, self.volatility, (scenarios, len(self.forecast))), axis=1
+        )
+        return np.clip(np.asarray(self.forecast) + errors, self.lower, self.upper)
+
+
+@dataclass(frozen=True)
+class PoissonCounts:
+    """
+    Independent Poisson counts per interval, e.g. flight arrivals
+    """
+
+    rate: float
+    intervals: int
+
+    def sample(self, rng: np.random.Generator, scenarios: int) -> np.ndarray:
+        return rng.poisson(self.rate, (scenarios, self.intervals))
+
+
+Distribution = RandomWalk | ForecastPath | PoissonCounts
+
+
+@dataclass(frozen=True)
+class MarketModel:
+    """
+    Distributions of all underlyings. Instances are hashable and used as cache key.
+    """
+
+    flow_rate: Distribution
+    water_level: Distribution
+    temperature: Distribution
+    humidity: Distribution
+    arrivals: Distribution
+    departures: Distribution
+    strike_price: float
+
+
+@dataclass(frozen=True)
+class Valuation:
+    product: str
+    fair_value: float
+    std: float
+    quantiles: dict[float, float] = field(default_factory=dict)
+
+    def band(self, lower: float = 0.05, upper: float = 0.95) -> tuple[float, float]:
+        return self.quantiles[lower], self.quantiles[upper]
+
+
+def _simulate(
+    args: tuple[MarketModel, np.random.SeedSequence, int],
+) -> dict[str, np.ndarray]:
+    model, seed, scenarios = args
+    rng = np.random.default_rng(seed)
+    return utils.settlement_values(
+        model.flow_rate.sample(rng, scenarios),
+        model.water_level.sample(rng, scenarios),
+        model.temperature.sample(rng, scenarios),
+        model.humidity.sample(rng, scenarios),
+        model.arrivals.sample(rng, scenarios),
+        model.departures.sample(rng, scenarios),
+        model.strike_price,
+    )
+
+
+class MonteCarloPricer:
+    """
+    Fair values and quantiles of every product under a `MarketModel`.
+
+    Scenarios are simulated in fixed-size chunks on a process pool, each chunk with
+    its own stream spawned from `seed`, so results are reproducible regardless of
+    the number of processes. The last valuation is cached until the model changes;
+    `valuations` is a plain attribute read for the quoting path.
+    """
+
+    def __init__(
+        self,
+        scenarios: int = 20_000,
+        seed: int = 0,
+        processes: int | None = None,
+        chunk_size: int = 2_500,
+        quantiles: tuple[float, ...] = (0.05, 0.25, 0.5, 0.75, 0.95),
+    ):
+        self.scenarios = scenarios
+        self.seed = seed
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.quantiles = quantiles
+        self.valuations: dict[str, Valuation] = {}
+        self._model: MarketModel | None = None
+        self._pool: Pool | None = None
+        self._lock = Lock()
+
+    def value(self, model: MarketModel) -> dict[str, Valuation]:
+        """
+        Valuations under `model`, simulated only if the model changed
+        """
+        with self._lock:
+            if model != self._model:
+                self.valuations = self._simulate(model)
+                self._model = model
+            return self.valuations
+
+    def _simulate(self, model: MarketModel) -> dict[str, Valuation]:
+        chunks = [
+            min(self.chunk_size, self.scenarios - start)
+            for start in range(0, self.scenarios, self.chunk_size)
+        ]
+        seeds = np.random.SeedSequence(self.seed).spawn(len(chunks))
+        jobs = [(model, seed, size) for seed, size in zip(seeds, chunks)]
+        if self.processes == 1:
+            results = list(map(_simulate, jobs))
+        else:
+            if self._pool is None:
+                self._pool = Pool(self.processes)
+            results = self._pool.map(_simulate, jobs)
+
+        valuations = {}
+        for product in utils.PRODUCTS:
+            values = np.concatenate([result[product] for result in results])
+            quantiles = np.quantile(values, self.quantiles)
+            valuations[product] = Valuation(
+                product,
+                float(values.mean()),
+                float(values.std()),
+                dict(zip(self.quantiles, quantiles.tolist())),
+            )
+        return valuations
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+if __name__ == "__main__":
+    model = MarketModel(
+        flow_rate=RandomWalk(start=20, volatility=0.5, intervals=48, lower=0),
+        water_level=RandomWalk(start=1.5, volatility=0.02, intervals=48, lower=0),
+        temperature=RandomWalk(start=45, volatility=0.8, intervals=48),
+        humidity=RandomWalk(start=70, volatility=1.5, intervals=48, lower=0, upper=100),
+        arrivals=PoissonCounts(rate=2.5, intervals=48),
+        departures=PoissonCounts(rate=2.5, intervals=48),
+        strike_price=40,
+    )
+    pricer = MonteCarloPricer()
+    for valuation in pricer.value(model).values():
+        print(valuation)
+    pricer.close()
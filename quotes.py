@@ -0,0 +1,194 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+from imcity_template import BaseBot, OrderBook, OrderRequest, OrderResponse, Side
+from ratelimit import TokenBucket
+
+
+@dataclass(frozen=True)
+class Quote:
+    side: Side
+    price: float
+    volume: int
+
+
+@dataclass
+class QuotePlan:
+    """
+    Requests that turn the live orders of `product` into the desired quotes
+    """
+
+    product: str
+    # Order ids to cancel, and price levels to cancel as a whole
+    cancels: list[str] = field(default_factory=list)
+    cancel_prices: list[float] = field(default_factory=list)
+    adds: list[OrderRequest] = field(default_factory=list)
+    # Price levels that already match
+    kept: int = 0
+
+    def __len__(self) -> int:
+        return len(self.cancels) + len(self.cancel_prices) + len(self.adds)
+
+
+class QuoteManager:
+    """
+    Keeps the bot's resting orders equal to a desired set of quotes per product.
+
+    Live orders come from the bot's `account` mirror; when the current book is
+    passed in, its `own_volume` takes precedence, so levels that already filled
+    are not cancelled and orders unknown to the mirror are cancelled by price.
+    Only the difference is sent: matching levels are left alone (keeping their
+    queue position), smaller levels lose their newest orders and larger levels get
+    one order for the missing volume.
+
+    Requests go out in parallel on the bot's worker pool, at most `rate` per
+    second. New orders are sent together with the cancels they replace, so a
+    moved quote stays in the market. Only cancels of orders a new quote would
+    trade against, and cancels by price at the price of a new quote, go out
+    before it.
+    """
+
+    def __init__(self, bot: BaseBot, rate: float | None = None, burst: int = 10):
+        self.bot = bot
+        self.limiter = TokenBucket(rate, burst) if rate else None
+        self.sent = 0
+        self.cancelled = 0
+        self.kept = 0
+
+    def plan(
+        self,
+        product: str,
+        quotes: Iterable[Quote],
+        orderbook: OrderBook | None = None,
+    ) -> QuotePlan:
+        plan = QuotePlan(product)
+        desired: dict[tuple[Side, float], int] = {}
+        for quote in quotes:
+            if quote.volume > 0:
+                key = (Side(quote.side), quote.price)
+                desired[key] = desired.get(key, 0) + quote.volume
+
+        live: dict[tuple[Side, float], list[dict[str, Any]]] = {}
+        for order in self.bot.account.snapshot.open_orders(product):
+            live.setdefault((Side(order["side"]), order["price"]), []).append(order)
+        own = None
+        if orderbook is not None:
+            own = {
+                (side, order.price): order.own_volume
+                for side, levels in (
+                    (Side.BUY, orderbook.buy_orders),
+                    (Side.SELL, orderbook.sell_orders),
+                )
+                for order in levels
+                if order.own_volume
+            }
+
+        for key in desired.keys() | live.keys() | (own.keys() if own else set()):
+            want = desired.get(key, 0)
+            # Oldest first, they have queue priority
+            orders = sorted(live.get(key, []), key=lambda order: order["timestamp"])
+            have = sum(order["volume"] for order in orders)
+            if own is not None:
+                in_book = own.get(key, 0)
+                if in_book > have:
+                    # Orders the mirror does not know about, only cancellable by price
+                    plan.cancel_prices.append(key[1])
+                    orders, have = [], 0
+                else:
+                    # The oldest orders filled first
+                    while orders and have - orders[0]["volume"] >= in_book:
+                        have -= orders.pop(0)["volume"]
+                    if have > in_book:
+                        # The oldest one partly, only the book's volume still rests
+                        oldest = orders[0]
+                        orders[0] = {
+                            **oldest,
+                            "volume": oldest["volume"] - (have - in_book),
+                        }
+                        have = in_book
+            if have == want:
+                if want:
+                    plan.kept += 1
+                continue
+            while orders and have > want:
+                order = orders.pop()
+                have -= order["volume"]
+                plan.cancels.append(order["id"])
+            if want > have:
+                plan.adds.append(OrderRequest(product, key[1], key[0], want - have))
+        return plan
+
+    def update(
+        self,
+        product: str,
+        quotes: Iterable[Quote],
+        orderbook: OrderBook | None = None,
+    ) -> list[OrderResponse | None]:
+        """
+        Requotes `product` to `quotes`, returns the responses of the new orders
+        """
+        return self.apply(self.plan(product, quotes, orderbook))
+
+    def clear(self, product: str, orderbook: OrderBook | None = None) -> None:
+        self.update(product, (), orderbook)
+
+    def apply(self, plan: QuotePlan) -> list[OrderResponse | None]:
+        self.kept += plan.kept
+        if not plan:
+            return []
+        open_orders = {
+            order["id"]: order
+            for order in self.bot.account.snapshot.open_orders(plan.product)
+        }
+        crossed = {
+            order_id
+            for order_id in plan.cancels
+            if order_id in open_orders
+            and any(self._crosses(add, open_orders[order_id]) for add in plan.adds)
+        }
+        # A cancel by price would also take out a new order at that price
+        # (including from the mirror), if the exchange handled the add first
+        added = {add.price for add in plan.adds}
+        cancel_first = [price for price in plan.cancel_prices if price in added]
+        cancel_price = lambda price: self.bot.cancel_order(plan.product, price)
+        cancelled = []
+        if crossed or cancel_first:
+            cancelled = self._run(
+                [(self.bot.cancel_order_by_id, order_id) for order_id in crossed]
+                + [(cancel_price, price) for price in cancel_first]
+            )
+
+        jobs: list[tuple[Callable, Any]] = [
+            (self.bot.cancel_order_by_id, order_id)
+            for order_id in plan.cancels
+            if order_id not in crossed
+        ]
+        jobs += [
+            (cancel_price, price) for price in plan.cancel_prices if price not in added
+        ]
+        jobs += [(self.bot.send_order, add) for add in plan.adds]
+        results = self._run(jobs)
+        sent = results[len(results) - len(plan.adds) :]
+        cancelled += results[: len(results) - len(plan.adds)]
+        # Failed requests return None
+        self.cancelled += sum(result is not None for result in cancelled)
+        self.sent += sum(result is not None for result in sent)
+        return sent
+
+    def stats(self) -> dict[str, int]:
+        return {"sent": self.sent, "cancelled": self.cancelled, "kept": self.kept}
+
+    @staticmethod
+    def _crosses(add: OrderRequest, order: dict[str, Any]) -> bool:
+        if add.side == Side.BUY:
+            return order["side"] == Side.SELL and add.price >= order["price"]
+        return order["side"] == Side.BUY and add.price <= order["price"]
+
+    def _run(self, jobs: list[tuple[Callable, Any]]) -> list:
+        def call(job):
+            fn, argument = job
+            if self.limiter:
+                self.limiter.acquire()
+            return fn(argument)
+
+        return self.bot.run_parallel(call, jobs)
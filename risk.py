@@ -0,0 +1,164 @@
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable
+
+from imcity_template import AccountMirror, AccountSnapshot, OrderRequest, Side
+from ratelimit import TokenBucket
+
+REJECT_REASONS = ("order_volume", "position", "open_volume", "notional", "rate")
+
+
+@dataclass(frozen=True)
+class RiskLimits:
+    """
+    Limits of one product, None disables a limit
+    """
+
+    # Volume of a single order
+    max_order_volume: int | None = None
+    # Net position if every open order on the order's side filled
+    max_position: int | None = None
+    # Open volume on one side
+    max_open_volume: int | None = None
+    # Open price * volume on one side
+    max_notional: float | None = None
+    # Orders per second, bursts of up to `burst`
+    rate: float | None = None
+    burst: float | None = None
+
+
+class RiskGate:
+    """
+    Pre-trade checks of every order a bot sends, `BaseBot(risk=RiskGate(...))`.
+
+    Positions and open orders come from the bot's `account` mirror, whose
+    snapshot carries the open volume and notional per product and side, so each
+    check is a handful of dict lookups however many orders are open. Orders that
+    passed but have not been answered yet are reserved here, so a batch sent in
+    parallel cannot overshoot a limit together.
+
+    Rates are token buckets per product and across all products (`rate`), taken
+    only by orders within all other limits. An order over a rate waits up to
+    `queue_timeout` seconds for a token if set, every other failed check rejects
+    the order at once. `rejected` counts the rejections by reason, see
+    `REJECT_REASONS`.
+    """
+
+    def __init__(
+        self,
+        limits: RiskLimits = RiskLimits(),
+        products: dict[str, RiskLimits] | None = None,
+        rate: float | None = None,
+        burst: float | None = None,
+        queue_timeout: float | None = None,
+    ):
+        self.limits = limits
+        self.products = products or {}
+        self.queue_timeout = queue_timeout
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self._buckets: dict[str, TokenBucket | None] = {}
+        # In-flight volume and notional by (product, side)
+        self._pending: dict[tuple[str, str], tuple[int, float]] = {}
+        self.admitted = 0
+        self.rejected = dict.fromkeys(REJECT_REASONS, 0)
+        self._lock = Lock()
+
+    def admit(self, order: OrderRequest, account: AccountMirror) -> bool:
+        """
+        Checks `order` against the limits and reserves it if it passes.
+        Every admitted order has to be released once its request is done.
+        """
+        with self._lock:
+            # Read under the lock, `release` updates the mirror while holding it
+            reason = self._check_limits(order, account.snapshot)
+            if reason is None:
+                self._reserve(order, 1)
+            else:
+                self.rejected[reason] += 1
+                return False
+        # Tokens are waited for outside the lock, the reservation holds the limits
+        if self._take_tokens(order):
+            with self._lock:
+                self.admitted += 1
+            return True
+        with self._lock:
+            self._reserve(order, -1)
+            self.rejected["rate"] += 1
+        return False
+
+    def release(
+        self, order: OrderRequest, update: Callable[[], Any] | None = None
+    ) -> None:
+        """
+        Drops the reservation of an admitted order, calling `update` (which adds
+        the order to the account mirror) in the same step
+        """
+        with self._lock:
+            if update is not None:
+                update()
+            self._reserve(order, -1)
+
+    def _reserve(self, order: OrderRequest, sign: int) -> None:
+        key = (order.product, order.side)
+        volume, notional = self._pending.get(key, (0, 0.0))
+        volume += sign * order.volume
+        if volume:
+            self._pending[key] = (volume, notional + sign * order.volume * order.price)
+        else:
+            self._pending.pop(key, None)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"admitted": self.admitted, **self.rejected}
+
+    def _limits(self, product: str) -> RiskLimits:
+        return self.products.get(product, self.limits)
+
+    def _bucket(self, product: str) -> TokenBucket | None:
+        try:
+            return self._buckets[product]
+        except KeyError:
+            limits = self._limits(product)
+            bucket = TokenBucket(limits.rate, limits.burst) if limits.rate else None
+            return self._buckets.setdefault(product, bucket)
+
+    def _take_tokens(self, order: OrderRequest) -> bool:
+        product = self._bucket(order.product)
+        for bucket in (product, self.bucket):
+            if bucket is None:
+                continue
+            if self.queue_timeout:
+                taken = bucket.acquire(timeout=self.queue_timeout)
+            else:
+                taken = bucket.try_acquire()
+            if not taken:
+                if bucket is self.bucket and product is not None:
+                    product.refund()
+                return False
+        return True
+
+    def _check_limits(
+        self, order: OrderRequest, account: AccountSnapshot
+    ) -> str | None:
+        limits = self._limits(order.product)
+        if (
+            limits.max_order_volume is not None
+            and order.volume > limits.max_order_volume
+        ):
+            return "order_volume"
+        key = (order.product, order.side)
+        open_volume, open_notional = account.open_exposure(*key)
+        pending_volume, pending_notional = self._pending.get(key, (0, 0.0))
+        volume = open_volume + pending_volume + order.volume
+        if limits.max_open_volume is not None and volume > limits.max_open_volume:
+            return "open_volume"
+        if limits.max_notional is not None and (
+            open_notional + pending_notional + order.volume * order.price
+            > limits.max_notional
+        ):
+            return "notional"
+        if limits.max_position is not None:
+            sign = 1 if order.side == Side.BUY else -1
+            if sign * account.position(order.product) + volume > limits.max_position:
+                return "position"
+        return None
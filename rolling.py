@@ -0,0 +1,97 @@
+from collections import deque
+from typing import Iterable, Literal
+
+
+class RollingExtrema:
+    """
+    Maximum and minimum over a sliding time window, using monotonic deques.
+
+    Each pushed value is appended and removed at most once, so `push` is amortised
+    O(1) and `max`/`min` are O(1).
+    """
+
+    __slots__ = ("window", "_max", "_min")
+
+    def __init__(self, window: float):
+        self.window = window
+        # (t, value) pairs; values decreasing in `_max`, increasing in `_min`
+        self._max: deque[tuple[float, float]] = deque()
+        self._min: deque[tuple[float, float]] = deque()
+
+    def push(self, t: float, high: float, low: float | None = None) -> None:
+        """
+        Adds an observation at time `t`. `high` feeds the maximum and `low` (default
+        `high`) feeds the minimum, e.g. the best ask and best bid of a tick.
+        """
+        low = high if low is None else low
+        maxima, minima = self._max, self._min
+        while maxima and maxima[-1][1] <= high:
+            maxima.pop()
+        maxima.append((t, high))
+        while minima and minima[-1][1] >= low:
+            minima.pop()
+        minima.append((t, low))
+
+    def expire(self, now: float) -> None:
+        """
+        Drops observations older than `now - window`
+        """
+        cutoff = now - self.window
+        maxima, minima = self._max, self._min
+        while maxima and maxima[0][0] < cutoff:
+            maxima.popleft()
+        while minima and minima[0][0] < cutoff:
+            minima.popleft()
+
+    @property
+    def max(self) -> float | None:
+        return self._max[0][1] if self._max else None
+
+    @property
+    def min(self) -> float | None:
+        return self._min[0][1] if self._min else None
+
+
+class BreakoutTracker:
+    """
+    Rolling max ask / min bid per product over several windows at once.
+
+    A bid above the window's max ask times `threshold` is a "sell" signal, an ask
+    below the window's min bid divided by `threshold` is a "buy" signal.
+    """
+
+    def __init__(self, windows: Iterable[float] = (300,), threshold: float = 1.05):
+        self.windows = tuple(windows)
+        self.threshold = threshold
+        self._extrema: dict[str, dict[float, RollingExtrema]] = {}
+
+    def extrema(self, product: str) -> dict[float, RollingExtrema]:
+        extrema = self._extrema.get(product)
+        if extrema is None:
+            extrema = self._extrema[product] = {
+                window: RollingExtrema(window) for window in self.windows
+            }
+        return extrema
+
+    def __contains__(self, product: str) -> bool:
+        return product in self._extrema
+
+    def update(self, product: str, t: float, bid: float, ask: float) -> None:
+        for extrema in self.extrema(product).values():
+            extrema.push(t, ask, bid)
+            extrema.expire(t)
+
+    def check(
+        self, product: str, t: float, bid: float, ask: float, window: float = 300
+    ) -> Literal["buy", "sell"] | None:
+        """
+        Breakout signal of a new tick against the window before it
+        """
+        extrema = self.extrema(product)[window]
+        extrema.expire(t)
+        max_ask, min_bid = extrema.max, extrema.min
+        if max_ask is not None and bid > max_ask * self.threshold:
+            return "sell"
+        if min_bid is not None and ask < min_bid / self.threshold:
+            return "buy"
+        return None
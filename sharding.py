@@ -0,0 +1,481 @@
+"""
+Multi-process strategy sharding by product.
+
+`ShardedBot` owns the market stream in the main process and writes every book
+into a shared-memory `BookRing`. Each group of products is handled by its own
+worker process, so a CPU-heavy strategy for one product no longer holds the GIL
+for all the others. Workers send orders back through a queue to the main
+process, where the `OrderGateway` runs them on the bot's pooled HTTP session:
+
+    bot = ShardedBot(url, username, password, groups, handler_factory)
+    bot.start()
+
+Workers are forked, so handler factories and their arguments need not be
+picklable; forking requires Linux or macOS.
+"""
+
+import argparse
+import itertools
+import math
+import multiprocessing
+import multiprocessing.synchronize
+import queue
+import time
+from multiprocessing.shared_memory import SharedMemory
+from threading import Thread
+from traceback import format_exc
+from typing import Any, Callable, Iterable
+
+import numpy as np
+
+from imcity_template import BaseBot, OrderBook, OrderLevels, OrderRequest, Trade
+
+# Bytes kept of an order book's exchange timestamp
+TIMESTAMP_SIZE = 32
+# Requests a worker may send through the gateway
+GATEWAY_METHODS = ("send_order", "cancel_order_by_id", "cancel_order")
+
+
+class BookRing:
+    """
+    Latest order books of a fixed set of products in shared memory.
+
+    Every product has a ring of `slots` snapshots with up to `depth` levels a
+    side. The single writer fills the next slot and then publishes it by bumping
+    the product's version, so it never waits for readers. Each slot is guarded
+    by a sequence lock: its sequence number is odd while the slot is written, and
+    a reader retries if it changed while copying. A reader only collides with the
+    writer if it is still copying a slot `slots` books later.
+
+    Published order relies on stores becoming visible in program order, as on
+    x86-64; numpy writes are not reordered by the interpreter.
+    """
+
+    def __init__(self, products: Iterable[str], depth: int = 50, slots: int = 4):
+        self.products = list(products)
+        self.index = {product: i for i, product in enumerate(self.products)}
+        self.depth = depth
+        self.slots = slots
+        shape = (len(self.products), slots)
+        levels = (*shape, 2, depth)
+        fields = [
+            ("versions", np.uint64, (len(self.products),)),
+            ("sequences", np.uint64, shape),
+            ("tick_sizes", np.float64, shape),
+            ("received_at", np.float64, shape),
+            ("lengths", np.int64, (*shape, 2)),
+            ("prices", np.float64, levels),
+            ("volumes", np.int64, levels),
+            ("own_volumes", np.int64, levels),
+            ("timestamps", f"S{TIMESTAMP_SIZE}", shape),
+        ]
+        size = sum(np.dtype(dtype).itemsize * math.prod(s) for _, dtype, s in fields)
+        self._shm = SharedMemory(create=True, size=size)
+        self._fields = [name for name, _, _ in fields]
+        offset = 0
+        for name, dtype, s in fields:
+            array = np.ndarray(s, dtype, buffer=self._shm.buf, offset=offset)
+            array.fill(0)
+            setattr(self, name, array)
+            offset += array.nbytes
+
+    def version(self, product: str) -> int:
+        """
+        Number of books written for `product` so far
+        """
+        return int(self.versions[self.index[product]])
+
+    def write(self, orderbook: OrderBook) -> bool:
+        i = self.index.get(orderbook.product)
+        if i is None:
+            return False
+        version = int(self.versions[i])
+        slot = version % self.slots
+        self.sequences[i, slot] = 2 * version + 1
+        self.tick_sizes[i, slot] = orderbook.tick_size
+        self.received_at[i, slot] = orderbook.received_at or math.nan
+        self.timestamps[i, slot] = (orderbook.timestamp or "").encode()
+        for side, levels in enumerate((orderbook.buy_orders, orderbook.sell_orders)):
+            n = min(len(levels), self.depth)
+            self.lengths[i, slot, side] = n
+            if n:
+                for target, source, dtype in (
+                    (self.prices, levels.prices, "f8"),
+                    (self.volumes, levels.volumes, "i8"),
+                    (self.own_volumes, levels.own_volumes, "i8"),
+                ):
+                    target[i, slot, side, :n] = np.frombuffer(source, dtype, n)
+        self.sequences[i, slot] = 2 * version + 2
+        self.versions[i] = version + 1
+        return True
+
+    def read(self, product: str) -> tuple[int, OrderBook] | None:
+        """
+        Version and copy of the newest book of `product`, None before the first
+        """
+        i = self.index[product]
+        while True:
+            version = int(self.versions[i])
+            if not version:
+                return None
+            slot = (version - 1) % self.slots
+            sequence = self.sequences[i, slot]
+            if sequence != 2 * version:
+                # Overwritten since the version was read, start over
+                continue
+            sides = []
+            for side in (0, 1):
+                n = self.lengths[i, slot, side]
+                sides.append(
+                    OrderLevels(
+                        self.prices[i, slot, side, :n].tobytes(),
+                        self.volumes[i, slot, side, :n].tobytes(),
+                        self.own_volumes[i, slot, side, :n].tobytes(),
+                    )
+                )
+            tick_size = float(self.tick_sizes[i, slot])
+            received_at = float(self.received_at[i, slot])
+            timestamp = self.timestamps[i, slot].decode()
+            if self.sequences[i, slot] == sequence:
+                return version, OrderBook(
+                    product,
+                    tick_size,
+                    sides[0],
+                    sides[1],
+                    timestamp or None,
+                    None if math.isnan(received_at) else received_at,
+                )
+
+    def close(self) -> None:
+        """
+        Releases and removes the shared memory, once all workers have exited
+        """
+        # Views into the buffer have to go before it can be closed
+        for name in self._fields:
+            setattr(self, name, None)
+        self._shm.close()
+        self._shm.unlink()
+
+
+class GatewayClient:
+    """
+    A worker's handle on the `OrderGateway`, with the `BaseBot` order methods.
+
+    Requests are queued and return at once; their results come back to the
+    worker's `ShardHandler.on_result` with the id returned here.
+    """
+
+    def __init__(self, worker: int, requests: multiprocessing.Queue):
+        self.worker = worker
+        self._requests = requests
+        self._ids = itertools.count()
+
+    def _call(self, method: str, *args: Any) -> int:
+        call = next(self._ids)
+        self._requests.put((self.worker, call, method, args))
+        return call
+
+    def send_order(self, order_request: OrderRequest) -> int:
+        return self._call("send_order", order_request)
+
+    def cancel_order_by_id(self, order_id: str) -> int:
+        return self._call("cancel_order_by_id", order_id)
+
+    def cancel_order(self, product: str, price: float) -> int:
+        return self._call("cancel_order", product, price)
+
+
+class OrderGateway:
+    """
+    Runs order requests of all workers on the bot's worker pool.
+
+    A single thread takes requests off the shared queue and hands them to the
+    bot's executor, so requests of different workers go out in parallel over
+    the pooled keep-alive connections; results go back to the worker's inbox.
+    """
+
+    def __init__(
+        self,
+        bot: BaseBot,
+        requests: multiprocessing.Queue,
+        inboxes: list[multiprocessing.Queue],
+        wakeups: list[multiprocessing.synchronize.Event],
+    ):
+        self.bot = bot
+        self.requests = requests
+        self._inboxes = inboxes
+        self._wakeups = wakeups
+        self.sent = 0
+        self._thread = Thread(target=self._run, name="OrderGateway", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def close(self) -> None:
+        self.requests.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while (request := self.requests.get()) is not None:
+            worker, call, method, args = request
+            if method not in GATEWAY_METHODS:
+                print(f"Order gateway: unknown method {method!r} from worker {worker}")
+                continue
+            self.sent += 1
+            future = self.bot._executor.submit(getattr(self.bot, method), *args)
+            future.add_done_callback(
+                lambda future, worker=worker, call=call: self._reply(
+                    worker, call, future
+                )
+            )
+
+    def _reply(self, worker: int, call: int, future) -> None:
+        try:
+            result = future.result()
+        except Exception:
+            print(format_exc())
+            result = None
+        self._inboxes[worker].put(("result", (call, result)))
+        self._wakeups[worker].set()
+
+
+class ShardHandler:
+    """
+    Strategies of one product group, running in a worker process
+    """
+
+    def __init__(self, products: list[str], gateway: GatewayClient):
+        self.products = products
+        self.gateway = gateway
+
+    def on_orderbook(self, orderbook: OrderBook) -> None:
+        pass
+
+    def on_trades(self, trades: list[Trade]) -> None:
+        pass
+
+    def on_result(self, call: int, result: Any) -> None:
+        """
+        Result of the gateway request with id `call`, e.g. an `OrderResponse`
+        """
+
+    def close(self) -> None:
+        pass
+
+
+HandlerFactory = Callable[[list[str], GatewayClient], ShardHandler]
+
+
+def _work(
+    worker: int,
+    products: list[str],
+    factory: HandlerFactory,
+    ring: BookRing,
+    inbox: multiprocessing.Queue,
+    wakeup: multiprocessing.synchronize.Event,
+    stopped: multiprocessing.synchronize.Event,
+    requests: multiprocessing.Queue,
+) -> None:
+    handler = factory(products, GatewayClient(worker, requests))
+    seen = dict.fromkeys(products, 0)
+    try:
+        while not stopped.is_set():
+            wakeup.wait(0.5)
+            # Books written after this are caught by the next wait
+            wakeup.clear()
+            while True:
+                try:
+                    kind, payload = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if kind == "trades":
+                        handler.on_trades(payload)
+                    else:
+                        handler.on_result(*payload)
+                except Exception:
+                    print(format_exc())
+            # Only the newest book of each product is handled
+            for product in products:
+                if ring.version(product) == seen[product]:
+                    continue
+                latest = ring.read(product)
+                if latest is not None:
+                    seen[product], orderbook = latest
+                    try:
+                        handler.on_orderbook(orderbook)
+                    except Exception:
+                        print(format_exc())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        handler.close()
+
+
+def shard_products(products: Iterable[str], processes: int) -> list[list[str]]:
+    """
+    Deals products round-robin into `processes` groups
+    """
+    groups = [[] for _ in range(processes)]
+    for i, product in enumerate(products):
+        groups[i % processes].append(product)
+    return [group for group in groups if group]
+
+
+class ShardedBot(BaseBot):
+    """
+    Bot whose strategies run in one worker process per group of products.
+
+    The main process only reads the market stream: books are written to a
+    `BookRing` and the owning worker is woken up, own trades are queued to the
+    workers owning their products. A worker that falls behind skips to the
+    newest book of each product. Orders from the workers go through the
+    `OrderGateway`, which also keeps `account` up to date.
+    """
+
+    def __init__(
+        self,
+        cmi_url: str,
+        username: str,
+        password: str,
+        groups: list[list[str]],
+        handler_factory: HandlerFactory,
+        depth: int = 50,
+        slots: int = 4,
+        **kwargs,
+    ):
+        super().__init__(cmi_url, username, password, **kwargs)
+        self.groups = groups
+        self.handler_factory = handler_factory
+        self.depth = depth
+        self.slots = slots
+        self.owner = {
+            product: worker for worker, group in enumerate(groups) for product in group
+        }
+        self.ring: BookRing | None = None
+        self.gateway: OrderGateway | None = None
+        self._workers: list[multiprocessing.Process] = []
+
+    def start(self, **kwargs) -> None:
+        """
+        Forks the workers, then starts the market stream, see `BaseBot.start`
+        """
+        context = multiprocessing.get_context("fork")
+        self.ring = BookRing(self.owner, self.depth, self.slots)
+        self._inboxes = [context.Queue() for _ in self.groups]
+        self._wakeups = [context.Event() for _ in self.groups]
+        self._stopped_workers = context.Event()
+        requests = context.Queue()
+        self._workers = [
+            context.Process(
+                target=_work,
+                args=(
+                    worker,
+                    group,
+                    self.handler_factory,
+                    self.ring,
+                    self._inboxes[worker],
+                    self._wakeups[worker],
+                    self._stopped_workers,
+                    requests,
+                ),
+                name=f"ShardedBot-{worker}",
+                daemon=True,
+            )
+            for worker, group in enumerate(self.groups)
+        ]
+        for process in self._workers:
+            process.start()
+        self.gateway = OrderGateway(self, requests, self._inboxes, self._wakeups)
+        self.gateway.start()
+        super().start(**kwargs)
+
+    def stop(self) -> None:
+        super().stop()
+        self._stopped_workers.set()
+        for wakeup in self._wakeups:
+            wakeup.set()
+        for process in self._workers:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        self._workers = []
+        self.gateway.close()
+        self.ring.close()
+
+    def on_orderbook(self, orderbook: OrderBook):
+        if self.ring.write(orderbook):
+            self._wakeups[self.owner[orderbook.product]].set()
+
+    def on_resynced(self, orderbooks: dict[str, OrderBook], gap: float):
+        for orderbook in orderbooks.values():
+            self.on_orderbook(orderbook)
+
+    def on_trades(self, trades: list[Trade]):
+        by_worker: dict[int, list[Trade]] = {}
+        for trade in trades:
+            # The stream carries every user's trades, workers only get their own
+            if self.username not in (trade["buyer"], trade["seller"]):
+                continue
+            worker = self.owner.get(trade["product"])
+            if worker is not None:
+                by_worker.setdefault(worker, []).append(trade)
+        for worker, own in by_worker.items():
+            self._inboxes[worker].put(("trades", own))
+            self._wakeups[worker].set()
+
+
+class SpinShard(ShardHandler):
+    """
+    Benchmark handler: burns `work` seconds of CPU per book, like a valuation
+    """
+
+    def __init__(self, products: list[str], gateway: GatewayClient, work: float):
+        super().__init__(products, gateway)
+        self.work = work
+        self.books = 0
+
+    def on_orderbook(self, orderbook: OrderBook) -> None:
+        end = time.perf_counter() + self.work
+        while time.perf_counter() < end:
+            pass
+        self.books += 1
+
+    def close(self) -> None:
+        print(f"{', '.join(self.products)}: {self.books} books")
+
+
+def main():
+    from exchange_sim import DEFAULT_PRODUCTS, SimulatedExchange
+
+    parser = argparse.ArgumentParser(
+        description="Books handled per second by a sharded bot on the exchange simulator"
+    )
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--work", type=float, default=0.002, help="seconds per book")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    groups = shard_products(DEFAULT_PRODUCTS, args.processes)
+    with SimulatedExchange(port=0) as exchange:
+        bot = ShardedBot(
+            exchange.url,
+            "bench",
+            "",
+            groups,
+            lambda products, gateway: SpinShard(products, gateway, args.work),
+            reconcile_interval=None,
+        )
+        bot.start()
+        end = time.monotonic() + args.seconds
+        for i in itertools.cycle(range(10)):
+            if time.monotonic() > end:
+                break
+            for product in DEFAULT_PRODUCTS:
+                exchange.submit("mm", product, "SELL", 100 + i, 1)
+            time.sleep(0.001)
+        bot.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator
+
+# Bytes requested per read; a read returns as soon as any data has arrived
+READ_SIZE = 65536
+
+
+@dataclass(frozen=True, slots=True)
+class SSEEvent:
+    event: str
+    # Raw bytes of the `data` field(s), ready for a JSON decoder
+    data: bytes
+    # Last event id the stream has set, as of this event
+    id: str | None = None
+
+
+class SSEParser:
+    """
+    Incremental parser of a `text/event-stream`, fed with bytes as they arrive.
+
+    Chunks are joined to whatever is left of an incomplete event and split at
+    blank lines with `bytes.find`; only complete events are parsed. Event data
+    stays bytes, multi-line `data:` fields are joined with newlines. `id:` sets
+    `last_event_id` and `retry:` sets the reconnection delay `retry` (in ms),
+    both of which outlive single events, as in the EventSource specification.
+    """
+
+    __slots__ = ("_buffer", "_cr", "last_event_id", "retry")
+
+    def __init__(self, last_event_id: str | None = None):
+        self._buffer = b""
+        # The previous chunk ended in CR, which may be the first half of CRLF
+        self._cr = False
+        self.last_event_id = last_event_id
+        self.retry: int | None = None
+
+    def feed(self, chunk: bytes) -> list[SSEEvent]:
+        if self._cr:
+            chunk = b"\r" + chunk
+            self._cr = False
+        if chunk.endswith(b"\r"):
+            chunk = chunk[:-1]
+            self._cr = True
+        if b"\r" in chunk:
+            chunk = chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+        # The rest of the buffer was searched before, only its last byte may
+        # begin a blank line
+        search = max(len(self._buffer) - 1, 0)
+        buffer = self._buffer + chunk if self._buffer else chunk
+        events = []
+        start = 0
+        while (end := buffer.find(b"\n\n", max(start, search))) >= 0:
+            event = self._parse(buffer[start:end])
+            if event is not None:
+                events.append(event)
+            start = end + 2
+        self._buffer = buffer[start:]
+        return events
+
+    def _parse(self, block: bytes) -> SSEEvent | None:
+        event = b""
+        data: list[bytes] = []
+        for line in block.split(b"\n"):
+            # Comments (e.g. keep-alives) and separators left over from the split
+            if not line or line[0] == 0x3A:
+                continue
+            field, _, value = line.partition(b":")
+            if value[:1] == b" ":
+                value = value[1:]
+            if field == b"data":
+                data.append(value)
+            elif field == b"event":
+                event = value
+            elif field == b"id":
+                if b"\0" not in value:
+                    self.last_event_id = value.decode()
+            elif field == b"retry":
+                if value.isdigit():
+                    self.retry = int(value)
+        if not data:
+            return None
+        return SSEEvent(
+            event.decode() if event else "message",
+            data[0] if len(data) == 1 else b"\n".join(data),
+            self.last_event_id,
+        )
+
+
+def read_chunks(stream: BinaryIO, size: int = READ_SIZE) -> Iterator[bytes]:
+    """
+    Chunks of a streamed response body as soon as they arrive, until it ends
+    """
+    while chunk := stream.read1(size):
+        yield chunk
+
+
+def iter_events(
+    chunks: Iterable[bytes], parser: SSEParser | None = None
+) -> Iterator[SSEEvent]:
+    parser = parser or SSEParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
@@ -1,57 +1,27 @@
-from imcity_template import BaseBot, Side, OrderRequest, OrderBook, Order
+from imcity_template import BaseBot, Side, OrderRequest, OrderBook, Order, Product
 
-import openmeteo_requests
 import requests
-from typing import Literal
+from threading import Event, Lock, Thread
+from traceback import format_exc
+from typing import Callable, Literal
 from datetime import datetime, timedelta
 import pandas as pd
-import requests_cache
-from retry_requests import retry
 
 import OutsiderTraders.utils as utils
+from OutsiderTraders.forecast import MUNICH, ForecastCache, ForecastKey, fetch_open_meteo
+from OutsiderTraders.sharding import GatewayClient, ShardHandler
+
+WEATHER_VARIABLES = ("temperature_2m", "relative_humidity_2m")
+WEATHER_3_WINDOW = ForecastKey(*MUNICH, WEATHER_VARIABLES, datetime(2025, 11, 22, 10), datetime(2025, 11, 23, 10))
+WEATHER_4_WINDOW = ForecastKey(*MUNICH, WEATHER_VARIABLES, datetime(2025, 11, 21, 9), datetime(2025, 11, 22, 8))
+
+# Forecast windows are refetched off the market data thread
+forecasts = ForecastCache()
+forecasts.watch(WEATHER_3_WINDOW)
+forecasts.watch(WEATHER_4_WINDOW)
 
 def fetch_weather_values(start: datetime = datetime(2025, 11, 22, 10), end: datetime = datetime(2025, 11, 23, 10)):
-	# 1. API Call (Added timezone=Europe/Berlin to match Munich time)
-	# url = "https://api.open-meteo.com/v1/forecast?latitude=48.1374&longitude=11.5755&hourly=temperature_2m,relative_humidity_2m&current=temperature_2m,relative_humidity_2m&past_days=1&forecast_days=3&temperature_unit=fahrenheit"
-	# Setup the Open-Meteo API client with cache and retry on error
-    cache_session = requests_cache.CachedSession('.cache', expire_after = 3600)
-    retry_session = retry(cache_session, retries = 5, backoff_factor = 0.2)
-    openmeteo = openmeteo_requests.Client(session = retry_session)
-
-    url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-    	"latitude": 48.1374,
-    	"longitude": 11.5755,
-    	"hourly": ["temperature_2m", "relative_humidity_2m"],
-    	"current": ["temperature_2m", "relative_humidity_2m"],
-    	"past_days": 1,
-    	"forecast_days": 3,
-    	"temperature_unit": "fahrenheit",
-    }
-    responses = openmeteo.weather_api(url, params=params)
-
-    # Process first location. Add a for-loop for multiple locations or weather models
-    response = responses[0]
-
-    # 2. Create DataFrame directly from the 'hourly' dictionary
-    # The dictionary looks like: {'time': [...], 'temperature_2m': [...], ...}
-    hourly = response.Hourly()
-
-    hourly_temperature_2m = hourly.Variables(0).ValuesAsNumpy()
-    hourly_relative_humidity_2m = hourly.Variables(1).ValuesAsNumpy()
-    hourly_data = {"date": pd.date_range(
-    		start = pd.to_datetime(hourly.Time(), unit = "s", utc = True),
-    	end =  pd.to_datetime(hourly.TimeEnd(), unit = "s", utc = True),
-    	freq = pd.Timedelta(seconds = hourly.Interval()),
-    	inclusive = "left"
-    )}
-    hourly_data["temperature"] = hourly_temperature_2m
-    hourly_data["humidity"] = hourly_relative_humidity_2m
-
-    df = pd.DataFrame(data = hourly_data)
-    df['date'] = pd.to_datetime(df['date'])
-    df.set_index('date', inplace=True)
-    df.index = df.index.tz_localize(None)
+    df = fetch_open_meteo(*MUNICH, WEATHER_VARIABLES)
 
 	# 5. Filter using the Time Index (Inclusive)
     filtered_df = df.loc[start:end]
@@ -67,35 +37,180 @@ def predict_weather_4_value(start: datetime = datetime(2025, 11, 22, 10), end: d
     val = utils.weather_4_value(filtered_df['temperature'], filtered_df['humidity'])
     return val
 
-def strategy(orderbook: OrderBook) -> Literal["buy", "sell", "hold"]:
-    if orderbook.product == "3_Weather":
-        val = predict_weather_3_value(datetime(2025, 11, 22, 10), datetime(2025, 11, 23, 10))
-        val -= 800
+Signal = Literal["buy", "sell", "hold"]
+
+class ProductStrategy:
+    """
+    Strategy for a single product.
+
+    `refresh` does the slow work (valuation, data loading) on the registry's timer
+    thread; `on_book` runs for every order book update and should only compare the
+    book with what `refresh` precomputed.
+    """
+
+    product: str
+
+    def __init__(self, product: str):
+        self.product = product
+
+    def refresh(self) -> None:
+        pass
+
+    def on_book(self, orderbook: OrderBook) -> Signal:
+        return "hold"
+
+class WeatherStrategy(ProductStrategy):
+    """
+    Trades when the book is more than `band` away from the forecast settlement value
+    """
+
+    def __init__(self, product: str, window: ForecastKey, valuation: Callable[[pd.DataFrame], float], offset: float = 0, band: float | None = 200):
+        super().__init__(product)
+        self.window = window
+        self.valuation = valuation
+        self.offset = offset
+        # None only observes the product
+        self.band = band
+        self.fair_value: float | None = None
+        self._fetched_at: float | None = None
+
+    def refresh(self) -> None:
+        window = forecasts.window(self.window)
+        # Only revalue when the forecast changed
+        if window is None or window.fetched_at == self._fetched_at:
+            return
+        self.fair_value = self.valuation(window.frame) + self.offset
+        self._fetched_at = window.fetched_at
+
+    def on_book(self, orderbook: OrderBook) -> Signal:
+        val = self.fair_value
+        if val is None or self.band is None:
+            return "hold"
+        if not orderbook.buy_orders or not orderbook.sell_orders:
+            return "hold"
         best_bid = orderbook.sell_orders[0].price
         best_ask = orderbook.buy_orders[0].price
-        print(val)
-        if best_bid + 200 < val:
+        if best_bid + self.band < val:
             print("BUY WEATHER")
             return "buy"
-        if best_ask - 200 > val:
+        if best_ask - self.band > val:
             print("SELL WEATHER")
             return "sell"
         print("HOLD WEATHER")
         return "hold"
-    if orderbook.product == "4_Weather":
-        val = predict_weather_4_value(datetime(2025, 11, 21, 9), datetime(2025, 11, 22, 8))
-        best_bid = orderbook.sell_orders[0].price
-        best_ask = orderbook.buy_orders[0].price
-        print(val)
-    return 'hold'
-#         if best_bid + 200 < val:
-#             print("BUY WEATHER")
-#             return "buy"
-#         if best_ask - 200 > val:
-#             print("SELL WEATHER")
-#             return "sell"
-#         print("HOLD WEATHER")
-#         return "hold"
+
+class StrategyRegistry:
+    """
+    Routes order books to the strategy registered for their product.
+
+    Lookup is a single dict access per book. A timer thread calls `refresh` on every
+    strategy each `refresh_interval` seconds, so valuation never happens on the
+    market data path.
+    """
+
+    def __init__(self, refresh_interval: float = 5):
+        self.refresh_interval = refresh_interval
+        self._strategies: dict[str, ProductStrategy] = {}
+        self._stopped = Event()
+        self._thread: Thread | None = None
+        # `strategy` starts the registry from every book handler
+        self._thread_lock = Lock()
+
+    @classmethod
+    def from_products(cls, products: list[Product], factories: dict[str, Callable[[str], ProductStrategy]], **kwargs) -> "StrategyRegistry":
+        """
+        Registry with a strategy for every product (e.g. from `BaseBot.request_all_products`)
+        that has a factory in `factories`
+        """
+        registry = cls(**kwargs)
+        for product in products:
+            factory = factories.get(product.symbol)
+            if factory is not None:
+                registry.register(factory(product.symbol))
+        return registry
+
+    def register(self, strategy: ProductStrategy) -> None:
+        self._strategies[strategy.product] = strategy
+
+    def __getitem__(self, product: str) -> ProductStrategy:
+        return self._strategies[product]
+
+    def dispatch(self, orderbook: OrderBook) -> Signal:
+        strategy = self._strategies.get(orderbook.product)
+        if strategy is None:
+            return "hold"
+        return strategy.on_book(orderbook)
+
+    def refresh(self) -> None:
+        for strategy in list(self._strategies.values()):
+            try:
+                strategy.refresh()
+            except Exception:
+                print(f"Failed to refresh strategy for {strategy.product}:")
+                print(format_exc())
+
+    def start(self) -> None:
+        with self._thread_lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = Thread(target=self._run, name="StrategyRegistry", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._thread_lock:
+            self._stopped.set()
+            if self._thread is not None:
+                self._thread.join()
+                self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self.refresh()
+            self._stopped.wait(self.refresh_interval)
+
+STRATEGY_FACTORIES: dict[str, Callable[[str], ProductStrategy]] = {
+    "3_Weather": lambda product: WeatherStrategy(product, WEATHER_3_WINDOW, lambda df: utils.weather_3_value(df['temperature'], df['humidity']), offset=-800),
+    "4_Weather": lambda product: WeatherStrategy(product, WEATHER_4_WINDOW, lambda df: utils.weather_4_value(df['temperature'], df['humidity']), band=None),
+}
+
+registry = StrategyRegistry()
+for _product, _factory in STRATEGY_FACTORIES.items():
+    registry.register(_factory(_product))
+
+def strategy(orderbook: OrderBook) -> Signal:
+    forecasts.start()
+    registry.start()
+    return registry.dispatch(orderbook)
+
+class StrategyShard(ShardHandler):
+    """
+    Runs the strategies of a product group in a `sharding.ShardedBot` worker and
+    trades `volume` at the touch on every buy or sell signal:
+
+        ShardedBot(url, username, password, [["3_Weather"], ["4_Weather"]], StrategyShard)
+    """
+
+    def __init__(self, products: list[str], gateway: GatewayClient, volume: int = 1):
+        super().__init__(products, gateway)
+        self.volume = volume
+        self.registry = StrategyRegistry()
+        for product in products:
+            if product in STRATEGY_FACTORIES:
+                self.registry.register(STRATEGY_FACTORIES[product](product))
+        # Started in the worker, threads do not survive the fork
+        forecasts.start()
+        self.registry.start()
+
+    def on_orderbook(self, orderbook: OrderBook) -> None:
+        signal = self.registry.dispatch(orderbook)
+        if signal == "buy" and orderbook.sell_orders:
+            self.gateway.send_order(OrderRequest(orderbook.product, orderbook.sell_orders[0].price, Side.BUY, self.volume))
+        elif signal == "sell" and orderbook.buy_orders:
+            self.gateway.send_order(OrderRequest(orderbook.product, orderbook.buy_orders[0].price, Side.SELL, self.volume))
+
+    def close(self) -> None:
+        self.registry.stop()
 
 if __name__ == "__main__":
     val = predict_weather_3_value(datetime(2025, 11, 21, 9), datetime(2025, 11, 22, 9))
@@ -0,0 +1,195 @@
+from array import array
+from dataclasses import dataclass
+from typing import Any, Iterable, Mapping
+
+from imcity_template import parse_timestamp
+
+
+@dataclass(frozen=True)
+class TapeStats:
+    trades: int
+    volume: int
+    vwap: float | None
+    # Mean price of buyer-initiated minus seller-initiated trades, see `utils.get_spread`
+    spread: float | None
+
+
+class _WindowSums:
+    """
+    Running sums over the trades of one product in the last `window` seconds
+    """
+
+    __slots__ = (
+        "window",
+        "start",
+        "trades",
+        "volume",
+        "value",
+        "buys",
+        "buy_prices",
+        "sells",
+        "sell_prices",
+    )
+
+    def __init__(self, window: float):
+        self.window = window
+        # Sequence number of the oldest trade still in the window
+        self.start = 0
+        self.trades = 0
+        self.volume = 0
+        self.value = 0.0
+        self.buys = 0
+        self.buy_prices = 0.0
+        self.sells = 0
+        self.sell_prices = 0.0
+
+    def add(self, price: float, volume: int, aggressor: int, sign: int = 1) -> None:
+        self.trades += sign
+        self.volume += sign * volume
+        self.value += sign * price * volume
+        if aggressor > 0:
+            self.buys += sign
+            self.buy_prices += sign * price
+        elif aggressor < 0:
+            self.sells += sign
+            self.sell_prices += sign * price
+        if not self.trades:
+            # Clear rounding errors left over from the subtractions
+            self.value = self.buy_prices = self.sell_prices = 0.0
+
+    def stats(self) -> TapeStats:
+        spread = None
+        if self.buys and self.sells:
+            spread = self.buy_prices / self.buys - self.sell_prices / self.sells
+        return TapeStats(
+            self.trades,
+            self.volume,
+            self.value / self.volume if self.volume else None,
+            spread,
+        )
+
+
+class _ProductTape:
+    """
+    Fixed-size ring buffer of one product's trades with sums per window
+    """
+
+    __slots__ = ("capacity", "times", "prices", "volumes", "aggressors", "end", "sums")
+
+    def __init__(self, capacity: int, windows: Iterable[float]):
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.prices = array("d", bytes(8 * capacity))
+        self.volumes = array("q", bytes(8 * capacity))
+        # +1 buyer-initiated, -1 seller-initiated, 0 unknown
+        self.aggressors = array("b", bytes(capacity))
+        # Sequence number of the next trade
+        self.end = 0
+        self.sums = {window: _WindowSums(window) for window in windows}
+
+    def push(self, t: float, price: float, volume: int, aggressor: int) -> None:
+        i = self.end % self.capacity
+        if self.end >= self.capacity:
+            # The oldest trade is overwritten, drop it from windows still holding it
+            oldest = self.end - self.capacity
+            for sums in self.sums.values():
+                if sums.start == oldest:
+                    self._drop(sums)
+        self.times[i] = t
+        self.prices[i] = price
+        self.volumes[i] = volume
+        self.aggressors[i] = aggressor
+        self.end += 1
+        for sums in self.sums.values():
+            sums.add(price, volume, aggressor)
+
+    def expire(self, now: float) -> None:
+        for sums in self.sums.values():
+            cutoff = now - sums.window
+            while (
+                sums.start < self.end
+                and self.times[sums.start % self.capacity] < cutoff
+            ):
+                self._drop(sums)
+
+    def _drop(self, sums: _WindowSums) -> None:
+        i = sums.start % self.capacity
+        sums.add(self.prices[i], self.volumes[i], self.aggressors[i], sign=-1)
+        sums.start += 1
+
+
+class TradeTape:
+    """
+    Sliding-window trade statistics per product, fed by market trade events.
+
+    Each product keeps its last `capacity` trades in a ring buffer and running
+    sums (volume, notional, aggressor prices) for every window in `windows`.
+    Adding a trade and expiring old ones touch each trade once, and every query
+    is answered from the sums in constant time. Time is the exchange time of the
+    newest trade seen, like the 5-minute window in `utils.get_most_traded_VWAP`.
+    """
+
+    def __init__(self, windows: Iterable[float] = (300,), capacity: int = 4096):
+        self.windows = tuple(windows)
+        self.capacity = capacity
+        self.now = float("-inf")
+        self._tapes: dict[str, _ProductTape] = {}
+
+    def on_trades(self, trades: Iterable[Mapping[str, Any]]) -> None:
+        """
+        Adds trades in the exchange's format, e.g. from a `BaseBot.on_trades` handler
+        """
+        for trade in trades:
+            aggressor = trade.get("aggressor")
+            self.add(
+                trade["product"],
+                parse_timestamp(trade["timestamp"]),
+                trade["price"],
+                trade["volume"],
+                (
+                    1
+                    if aggressor and aggressor == trade["buyer"]
+                    else -1 if aggressor and aggressor == trade["seller"] else 0
+                ),
+            )
+
+    def add(
+        self, product: str, t: float, price: float, volume: int, aggressor: int = 0
+    ) -> None:
+        tape = self._tapes.get(product)
+        if tape is None:
+            tape = self._tapes[product] = _ProductTape(self.capacity, self.windows)
+        tape.push(t, price, volume, aggressor)
+        if t > self.now:
+            self.now = t
+        tape.expire(self.now)
+
+    def products(self) -> list[str]:
+        return list(self._tapes)
+
+    def stats(self, product: str, window: float | None = None) -> TapeStats:
+        window = self.windows[0] if window is None else window
+        tape = self._tapes.get(product)
+        if tape is None:
+            return TapeStats(0, 0, None, None)
+        tape.expire(self.now)
+        return tape.sums[window].stats()
+
+    def vwap(self, product: str, window: float | None = None) -> float | None:
+        return self.stats(product, window).vwap
+
+    def spread(self, product: str, window: float | None = None) -> float | None:
+        return self.stats(product, window).spread
+
+    def volume(self, product: str, window: float | None = None) -> int:
+        return self.stats(product, window).volume
+
+    def most_traded(self, window: float | None = None) -> tuple[str, TapeStats] | None:
+        """
+        Product with the highest traded volume in the window and its stats
+        """
+        stats = [(product, self.stats(product, window)) for product in self._tapes]
+        stats = [(product, stat) for product, stat in stats if stat.volume]
+        if not stats:
+            return None
+        return max(stats, key=lambda item: item[1].volume)
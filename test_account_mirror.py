@@ -0,0 +1,63 @@
+from backtest import SimulatedBroker
+from imcity_template import AccountMirror, OrderRequest, Side
+
+
+def _trade(buyer: str, seller: str, volume: int, price: float) -> dict:
+    return {
+        "timestamp": "2025-11-22T12:00:00Z",
+        "product": "7_ETF",
+        "buyer": buyer,
+        "seller": seller,
+        "aggressor": buyer,
+        "volume": volume,
+        "price": price,
+    }
+
+
+def _response(volume: int, filled: int) -> dict:
+    return {
+        "id": "1",
+        "status": "PART_FILLED",
+        "product": "7_ETF",
+        "side": "BUY",
+        "price": 101.0,
+        "volume": volume,
+        "filled": filled,
+        "user": "me",
+        "timestamp": "2025-11-22T12:00:00Z",
+        "targetUser": None,
+        "message": None,
+    }
+
+
+def test_partially_filled_aggressive_order_is_filled_once():
+    broker = SimulatedBroker("me")
+    broker.account.seed([], {})
+    broker.update_book(
+        {
+            "productsymbol": "7_ETF",
+            "tickSize": 1.0,
+            "buyOrders": {},
+            "sellOrders": {"100.0": {"marketVolume": 4, "userVolume": 0}},
+        }
+    )
+    response = broker.send_order(OrderRequest("7_ETF", 101, Side.BUY, 10))
+    assert (response.volume, response.filled) == (6, 4)
+
+    broker.account.on_trades(broker.own_trades)
+    snapshot = broker.account.snapshot
+    assert snapshot.open_exposure("7_ETF", Side.BUY)[0] == 6
+    assert snapshot.position("7_ETF") == 4
+
+
+def test_trade_before_response_is_filled_once():
+    mirror = AccountMirror("me")
+    mirror.seed([], {})
+    mirror.on_trades([_trade("me", "mm", 4, 100.0)])
+    mirror.on_order(_response(6, 4))
+    assert mirror.snapshot.open_exposure("7_ETF", Side.BUY)[0] == 6
+
+    # Later fills of the resting order still apply
+    mirror.on_trades([_trade("me", "mm", 2, 101.0)])
+    assert mirror.snapshot.open_exposure("7_ETF", Side.BUY)[0] == 4
+    assert mirror.snapshot.position("7_ETF") == 6
@@ -0,0 +1,212 @@
+import json
+import math
+import os
+import struct
+import time
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Iterator, TextIO
+
+import numpy as np
+
+# One fixed-width little-endian record per tick:
+# local time, exchange time (NaN if unknown), best bid/ask and their volumes
+TICK_DTYPE = np.dtype(
+    [
+        ("t", "<f8"),
+        ("exchange_t", "<f8"),
+        ("bid", "<f8"),
+        ("ask", "<f8"),
+        ("bid_volume", "<i8"),
+        ("ask_volume", "<i8"),
+    ]
+)
+_TICK = struct.Struct("<ddddqq")
+assert _TICK.size == TICK_DTYPE.itemsize
+
+TICK_SUFFIX = ".ticks"
+
+
+def tick_path(directory: str, product: str) -> str:
+    return os.path.join(directory, f"{product}{TICK_SUFFIX}")
+
+
+class TickRecorder:
+    """
+    Appends fixed-width binary tick records to one file per product
+    """
+
+    def __init__(self, directory: str = ".", autoflush: bool = True):
+        self.directory = directory
+        self.autoflush = autoflush
+        self._files: dict[str, BinaryIO] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, product: str) -> str:
+        return tick_path(self.directory, product)
+
+    def record(
+        self,
+        product: str,
+        bid: float,
+        ask: float,
+        bid_volume: int = 0,
+        ask_volume: int = 0,
+        t: float | None = None,
+        exchange_t: float = math.nan,
+    ) -> None:
+        file = self._files.get(product)
+        if file is None:
+            file = self._files[product] = open(self.path(product), "ab")
+        file.write(
+            _TICK.pack(
+                time.time() if t is None else t,
+                exchange_t,
+                bid,
+                ask,
+                bid_volume,
+                ask_volume,
+            )
+        )
+        if self.autoflush:
+            file.flush()
+
+    def flush(self) -> None:
+        for file in self._files.values():
+            file.flush()
+
+    def close(self) -> None:
+        for file in self._files.values():
+            file.close()
+        self._files.clear()
+
+    def __enter__(self) -> "TickRecorder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class TickStore:
+    """
+    Read-only, memory-mapped view of a tick file written by `TickRecorder`.
+
+    Records are appended in local time order, so time-range queries are a binary
+    search on the `t` column. The mapping is refreshed when the file has grown.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._ticks = np.empty(0, dtype=TICK_DTYPE)
+        self._size = 0
+
+    @classmethod
+    def open(cls, directory: str, product: str) -> "TickStore":
+        return cls(tick_path(directory, product))
+
+    @property
+    def ticks(self) -> np.ndarray:
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            size = 0
+        # Ignore a trailing record the writer has not finished yet
+        size -= size % TICK_DTYPE.itemsize
+        if size != self._size:
+            self._size = size
+            self._ticks = (
+                np.memmap(
+                    self.path,
+                    dtype=TICK_DTYPE,
+                    mode="r",
+                    shape=(size // TICK_DTYPE.itemsize,),
+                )
+                if size
+                else np.empty(0, dtype=TICK_DTYPE)
+            )
+        return self._ticks
+
+    def __len__(self) -> int:
+        return len(self.ticks)
+
+    def between(self, start: float, end: float = math.inf) -> np.ndarray:
+        """
+        Ticks with `start` <= t < `end`, as a view into the mapped file
+        """
+        ticks = self.ticks
+        t = ticks["t"]
+        return ticks[
+            np.searchsorted(t, start, "left") : np.searchsorted(t, end, "left")
+        ]
+
+    def last(self, seconds: float, now: float | None = None) -> np.ndarray:
+        """
+        Ticks of the last `seconds` seconds
+        """
+        now = time.time() if now is None else now
+        return self.between(now - seconds)
+
+
+JOURNAL_SUFFIX = ".jsonl"
+
+
+class EventJournal:
+    """
+    Appends raw market stream events as JSON lines, one file per UTC day.
+
+    Every line is `{"t": <local time>, "event": "order" | "trade", "data": ...}`
+    with `data` exactly as sent by the exchange, so a session can be replayed
+    through the same code that handled it live.
+    """
+
+    def __init__(self, directory: str = ".", autoflush: bool = True):
+        self.directory = directory
+        self.autoflush = autoflush
+        self._day: str | None = None
+        self._file: TextIO | None = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, day: str) -> str:
+        return os.path.join(self.directory, f"events-{day}{JOURNAL_SUFFIX}")
+
+    def record(self, event: str, data: Any, t: float | None = None) -> None:
+        t = time.time() if t is None else t
+        day = datetime.fromtimestamp(t, timezone.utc).strftime("%Y-%m-%d")
+        if day != self._day:
+            self.close()
+            self._file = open(self.path(day), "a")
+            self._day = day
+        self._file.write(
+            json.dumps({"t": t, "event": event, "data": data}, separators=(",", ":"))
+            + "\n"
+        )
+        if self.autoflush:
+            self._file.flush()
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._day = None
+
+    def __enter__(self) -> "EventJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_journal(path: str) -> Iterator[tuple[float, str, Any]]:
+    """
+    `(t, event, data)` of every complete line of a journal file, read lazily
+    """
+    with open(path) as file:
+        for line in file:
+            # A line the writer has not finished yet has no newline
+            if not line.endswith("\n"):
+                break
+            record = json.loads(line)
+            yield record["t"], record["event"], record["data"]
@@ -1,8 +1,10 @@
-import requests
-import statistics as st
+import heapq
+import numpy as np
 import pandas as pd
-from imcity_template import BaseBot, Side, OrderRequest, OrderBook, Order
+from imcity_template import BaseBot, Side, OrderRequest, OrderBook, Order, parse_timestamp
 from typing import Tuple
+from functools import cache
+from tape import TradeTape
 
 def eisbach_value(flow_rate: float, water_level: float) -> float:
     """
@@ -35,38 +37,124 @@ def weather_3_value(temperatures: list[float]|pd.Series, humidities: list[float]
     # TODO: get half-hourly data and remove *2
     return abs(total_sum)
 
-def weather_4_value(temperatures: list[float]|pd.Series, humidities: list[float]|pd.Series) -> np.float:
+def running_median(values: list[float] | np.ndarray) -> np.ndarray:
+    """
+    Median of every prefix of `values`, in O(n log n) using two heaps
+    """
+    lower: list[float] = []  # max-heap (negated) holding the smaller half
+    upper: list[float] = []  # min-heap holding the larger half
+    medians = np.empty(len(values))
+    for i, value in enumerate(values):
+        if lower and value > -lower[0]:
+            heapq.heappush(upper, value)
+        else:
+            heapq.heappush(lower, -value)
+        # Rebalance so that len(lower) is len(upper) or len(upper) + 1
+        if len(lower) > len(upper) + 1:
+            heapq.heappush(upper, -heapq.heappop(lower))
+        elif len(upper) > len(lower):
+            heapq.heappush(lower, -heapq.heappop(upper))
+        if len(lower) > len(upper):
+            medians[i] = -lower[0]
+        else:
+            medians[i] = (-lower[0] + upper[0]) / 2
+    return medians
+
+
+def running_median_batch(values: np.ndarray) -> np.ndarray:
+    """
+    Prefix medians along the last axis for many series at once.
+
+    Each row's values are ranked up front; a Fenwick tree per row counts the ranks
+    seen so far and the k-th smallest is found by binary descent, all rows in
+    lockstep. O(n log n) NumPy operations of width `rows` in total.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    rows, n = values.shape
+    medians = np.empty_like(values)
+    if n == 0:
+        return medians
+    order = np.argsort(values, axis=1, kind="stable")
+    ordered = np.take_along_axis(values, order, axis=1)
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.broadcast_to(np.arange(n), (rows, n)), axis=1)
+
+    row = np.arange(rows)
+    tree = np.zeros((rows, n + 1), dtype=np.int64)
+    top_step = 1 << (n.bit_length() - 1)
+
+    def kth(k: int) -> np.ndarray:
+        # 0-based rank of the k-th (1-based) smallest inserted value in each row
+        position = np.zeros(rows, dtype=np.int64)
+        remaining = np.full(rows, k, dtype=np.int64)
+        step = top_step
+        while step:
+            candidate = position + step
+            count = tree[row, np.minimum(candidate, n)]
+            take = (candidate <= n) & (count < remaining)
+            position = np.where(take, candidate, position)
+            remaining = np.where(take, remaining - count, remaining)
+            step >>= 1
+        return position
+
+    for i in range(n):
+        index = ranks[:, i] + 1
+        while True:
+            active = index <= n
+            if not active.any():
+                break
+            tree[row[active], index[active]] += 1
+            index += index & -index
+        count = i + 1
+        median = ordered[row, kth((count + 1) // 2)]
+        if count % 2 == 0:
+            median = (median + ordered[row, kth(count // 2 + 1)]) / 2
+        medians[:, i] = median
+    return medians
+
+
+def weather_4_value(temperatures: list[float]|pd.Series, humidities: list[float]|pd.Series) -> float:
     """
     Settlement value for 4_Weather
     """
     # Sanity check: Ensure we have pairs for every interval
     if len(temperatures) != len(humidities):
         raise ValueError("Temperature and Humidity lists must have the same length.")
-    
-    total_settlement = 0.0
-    
-    # Iterate through the data, index 'i' represents the current time step
-    for i in range(len(temperatures)):
-        # 1. Define the Window
-        window_temps = temperatures[:i+1]
-        window_hums = humidities[:i+1]
-        
-        # 2. Calculate Statistics for this window
-        t_mean = st.mean(window_temps)
-        t_median = st.median(window_temps)
-        h_mean = st.mean(window_hums)
-        h_median = st.median(window_hums)
-        
-        current_temp = temperatures[i]
-        current_humidity = humidities[i]
-        
-        step_value = (current_temp+current_humidity) * ((t_mean - t_median) * (h_mean - h_median))
-        
-        # TODO: get half-hourly data and remove *2
-        total_settlement += step_value
 
-    # 4. Final Absolute Value
-    return abs(total_settlement)
+    temperatures = np.asarray(temperatures, dtype=float)
+    humidities = np.asarray(humidities, dtype=float)
+
+    # Mean and median of the window up to and including each step
+    steps = np.arange(1, len(temperatures) + 1)
+    t_mean = np.cumsum(temperatures) / steps
+    h_mean = np.cumsum(humidities) / steps
+    t_median = running_median(temperatures)
+    h_median = running_median(humidities)
+
+    step_values = (temperatures + humidities) * ((t_mean - t_median) * (h_mean - h_median))
+
+    # Final Absolute Value
+    return abs(float(step_values.sum()))
+
+
+def weather_4_values(temperatures: np.ndarray, humidities: np.ndarray) -> np.ndarray:
+    """
+    Settlement values for 4_Weather of many scenarios at once.
+    Inputs have shape (scenarios, intervals), the result has shape (scenarios,).
+    """
+    temperatures = np.atleast_2d(np.asarray(temperatures, dtype=float))
+    humidities = np.atleast_2d(np.asarray(humidities, dtype=float))
+    if temperatures.shape != humidities.shape:
+        raise ValueError("Temperature and Humidity arrays must have the same shape.")
+
+    steps = np.arange(1, temperatures.shape[1] + 1)
+    t_mean = np.cumsum(temperatures, axis=1) / steps
+    h_mean = np.cumsum(humidities, axis=1) / steps
+    t_median = running_median_batch(temperatures)
+    h_median = running_median_batch(humidities)
+
+    step_values = (temperatures + humidities) * ((t_mean - t_median) * (h_mean - h_median))
+    return np.abs(step_values.sum(axis=1))
 
 def flights_value(arrivals: list[int], departures: list[int]) -> float:
     """
@@ -107,17 +195,93 @@ def etf_strangle_value(flow_rate: float, water_level: float, latest_temp: float,
     TODO: AI generated, did not verify
     Settlement value for 8_ETF_Strangle
     """
+    etf = etf_value(flow_rate, water_level, latest_temp, latest_humidity, arrivals, departures)
+
     # 1. Calculate Put Payoff (Strike 80)
     # Formula: max(0, Strike - Underlying)
-    put_payoff = max(0, 80 - etf_value(flow_rate, water_level, latest_temp, latest_humidity, arrivals, departures))
+    put_payoff = max(0, 80 - etf)
     
     # 2. Calculate Call Payoff (Strike 100)
     # Formula: max(0, Underlying - Strike)
-    call_payoff = max(0, etf_value(flow_rate, water_level, latest_temp, latest_humidity, arrivals, departures) - 100)
+    call_payoff = max(0, etf - 100)
     
     # 3. Total Settlement
     return put_payoff + call_payoff
 
+PRODUCTS = (
+    "1_Eisbach",
+    "2_Eisbach_Call",
+    "3_Weather",
+    "4_Weather",
+    "5_Flights",
+    "6_Airport",
+    "7_ETF",
+    "8_ETF_Strangle",
+)
+
+def airport_values(arrivals: np.ndarray, departures: np.ndarray) -> np.ndarray:
+    """
+    Settlement values for 6_Airport of shape (scenarios,)
+    """
+    arrivals = np.atleast_2d(np.asarray(arrivals, dtype=float))
+    departures = np.atleast_2d(np.asarray(departures, dtype=float))
+    volume = arrivals + departures
+    # Intervals without flights contribute 0, as in airport_value
+    with np.errstate(divide="ignore", invalid="ignore"):
+        metric = np.where(volume == 0, 0.0, 300 * (arrivals - departures) / volume**1.5)
+    return np.round(np.abs(metric.sum(axis=1)))
+
+def settlement_values(
+    flow_rates: np.ndarray,
+    water_levels: np.ndarray,
+    temperatures: np.ndarray,
+    humidities: np.ndarray,
+    arrivals: np.ndarray,
+    departures: np.ndarray,
+    strike_price: float,
+) -> dict[str, np.ndarray]:
+    """
+    Settlement values of all eight products for many scenarios at once.
+
+    Every input has shape (scenarios, intervals); the number of intervals may differ
+    between underlyings. Point-in-time products (1_Eisbach, 7_ETF) use the last
+    interval. Returns an array of shape (scenarios,) per product symbol.
+    """
+    flow_rates = np.atleast_2d(np.asarray(flow_rates, dtype=float))
+    water_levels = np.atleast_2d(np.asarray(water_levels, dtype=float))
+    temperatures = np.atleast_2d(np.asarray(temperatures, dtype=float))
+    humidities = np.atleast_2d(np.asarray(humidities, dtype=float))
+    arrivals = np.atleast_2d(np.asarray(arrivals, dtype=float))
+    departures = np.atleast_2d(np.asarray(departures, dtype=float))
+
+    flow_rate, water_level = flow_rates[:, -1], water_levels[:, -1]
+    latest_temp, latest_humidity = temperatures[:, -1], humidities[:, -1]
+
+    eisbach_call = np.round(
+        water_levels.max(axis=1) * flow_rates.max(axis=1)
+        - (water_levels.min(axis=1) - flow_rates.min(axis=1))
+    )
+    # Shared by 6_Airport, 7_ETF and 8_ETF_Strangle
+    airport = airport_values(arrivals, departures)
+    etf = np.abs(
+        0.3 * flow_rate
+        + 0.1 * water_level
+        + 0.2 * latest_temp
+        + 0.1 * latest_humidity
+        + 0.3 * airport
+    )
+
+    return {
+        "1_Eisbach": np.round(flow_rate * water_level),
+        "2_Eisbach_Call": np.maximum(0, eisbach_call - strike_price),
+        "3_Weather": np.abs((temperatures * 2 + humidities).sum(axis=1)),
+        "4_Weather": weather_4_values(temperatures, humidities),
+        "5_Flights": 3 * (arrivals.sum(axis=1) + departures.sum(axis=1)),
+        "6_Airport": airport,
+        "7_ETF": etf,
+        "8_ETF_Strangle": np.maximum(0, 80 - etf) + np.maximum(0, etf - 100),
+    }
+
 def get_spread(recent_trades: pd.DataFrame) -> float:
     # compute the spread
     ask_trades = recent_trades[recent_trades['aggressor'] == recent_trades['buyer']]
@@ -138,66 +302,41 @@ def get_spread(recent_trades: pd.DataFrame) -> float:
     
     return average_spread
 
-def get_most_traded_VWAP(exchange, username, password) -> Tuple[str, float, float]:
+@cache
+def _trades_bot(exchange, username, password) -> BaseBot:
     class CustomBot(BaseBot):
-        # Handler for own trades
         def on_trades(self, trades: list[dict]):
-            for trade in trades:
-                print(f"{trade['volume']} @ {trade['price']}")
+            ...
 
-        # Handler for order book updates
         def on_orderbook(self, orderbook: OrderBook):
             ...
 
+    # One bot per login, so repeated calls reuse its token and connections
+    return CustomBot(exchange, username, password)
 
-    bot = CustomBot(exchange, username, password)
-
-    response = requests.get(
-        f"{exchange}/api/trade", headers=bot._get_headers()
-    )
-    trades = response.json()
-    df = pd.DataFrame(trades)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
+def get_most_traded_VWAP(exchange, username, password) -> Tuple[str, float, float]:
+    bot = _trades_bot(exchange, username, password)
+    trades = bot.request_trades() or []
 
     # 2. Define the time window
-    latest_time = df['timestamp'].max()
     timedelta = 5
-    start_time = latest_time - pd.Timedelta(minutes=timedelta)
-
-    recent_trades = df[df['timestamp'] >= start_time]
+    tape = TradeTape(windows=(timedelta * 60,), capacity=max(1, len(trades)))
+    # Fractional seconds vary in length, so timestamps only sort as times
+    tape.on_trades(sorted(trades, key=lambda trade: parse_timestamp(trade['timestamp'])))
 
-    if not recent_trades.empty:
-        # 2. Group by product and sum the volume
-        # .idxmax() returns the index (product name) with the highest value
-        most_traded_product = recent_trades.groupby('product')['volume'].sum().idxmax()
-
-        # Optional: Get the actual volume number too
-        total_vol = recent_trades.groupby('product')['volume'].sum().max()
-
-        print(f"Most traded product: {most_traded_product} (Volume: {total_vol})")
-    else:
+    most_traded = tape.most_traded()
+    if most_traded is None:
         print("No trades in the timeframe.")
+        return None
+    most_traded_product, stats = most_traded
+    print(f"Most traded product: {most_traded_product} (Volume: {stats.volume})")
 
-    recent_trades = recent_trades[recent_trades['product'] == most_traded_product]
-
-    spread = get_spread(recent_trades)
-
-    # Calculate VWAP
-    target_product = most_traded_product
-    if not recent_trades.empty:
-        total_value = (recent_trades['price'] * recent_trades['volume']).sum()
-        total_volume = recent_trades['volume'].sum()
-
-        # Avoid division by zero if volume is 0
-        if total_volume > 0:
-            vwap = total_value / total_volume
-            print(f"VWAP for {target_product} (Last {timedelta} Mins): {vwap:.2f}")
-            print(f"Based on {len(recent_trades)} trades from {start_time.time()} to {latest_time.time()}")
-        else:
-            print("Total volume is 0.")
+    if stats.spread is not None:
+        print(f"Estimated Spread: {stats.spread:.2f}")
     else:
-        print(f"No trades found for {target_product} in the last 10 minutes.")
-        return None
+        print("Not enough data to calculate spread (need both buy and sell aggressors in the window).")
+
+    print(f"VWAP for {most_traded_product} (Last {timedelta} Mins): {stats.vwap:.2f}")
+    print(f"Based on {stats.trades} trades")
 
-    return most_traded_product, vwap, spread
-    
\ No newline at end of file
+    return most_traded_product, stats.vwap, stats.spread